@@ -50,6 +50,56 @@ class BlogAPITests(APITestCase):
         content = json.loads(response.content)
         self.assertEquals(len(content['results']), 2, 'Expected 1 result')
 
+    def test_posts_cursor_pagination_walks_all_posts(self):
+        """
+        Test posts endpoint following the cursor next links.
+        """
+        from django.conf import settings
+        reset_db()
+        paginate_by = settings.REST_FRAMEWORK.get('POST_PAGINATE_BY', 0)
+        for i in range(paginate_by * 2 + 1):
+            create_post('Test post %s' % i)
+        c = APIClient()
+        response = c.get('/api/posts', {'cursor': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected HTTP 200.')
+        content = json.loads(response.content)
+        self.assertEquals(content['count'], paginate_by * 2 + 1, 'Expected count on first page')
+        ids = [r['id'] for r in content['results']]
+        while content['next']:
+            response = c.get(content['next'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected HTTP 200.')
+            content = json.loads(response.content)
+            ids.extend([r['id'] for r in content['results']])
+        self.assertEquals(len(set(ids)), paginate_by * 2 + 1, 'Expected every post once')
+
+    def test_posts_resolves_user_names(self):
+        """
+        Test posts endpoint resolves the user name of each post author.
+        """
+        from django.contrib.auth.models import User
+        reset_db()
+        john = create_user('John')
+        create_post(user=john)
+        create_post(user=create_user('Paul'))
+        create_post(user=john)
+        lookups = []
+        filter = User.objects.filter
+        def counting_filter(*args, **kwargs):
+            if 'pk__in' in kwargs:
+                lookups.append(sorted(kwargs['pk__in']))
+            return filter(*args, **kwargs)
+        User.objects.filter = counting_filter
+        try:
+            c = APIClient()
+            response = c.get('/api/posts')
+        finally:
+            del User.objects.filter
+        content = json.loads(response.content)
+        self.assertEquals(sorted(r['user_name'] for r in content['results']), ['John', 'John', 'Paul'],
+                          'Unexpected user names')
+        self.assertEquals(len(lookups), 1, 'Expected one batch lookup per page')
+        self.assertEquals(len(lookups[0]), 2, 'Expected each user looked up once')
+
     def test_post_returns_404_on_empty_db(self):
         """
         Test post endpoint with an empty database.
@@ -107,7 +157,7 @@ class BlogAPITests(APITestCase):
         content = json.loads(response.content)
         self.assertEquals(len(content['results']), 2, 'Expected 1 result')
 
-    def test_comment_returns_405_on_get_put_patch_delete_and_head(self):
+    def test_comment_returns_405_on_put_patch_and_delete(self):
         """
         Test posts/ID/comments endpoint with different methods.
         """
@@ -115,16 +165,37 @@ class BlogAPITests(APITestCase):
         p = create_post()
         client = APIClient()
         url = '/api/posts/%s/comments' % p.id
-        response = client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED, 'Expected HTTP 405 on GET.')
         response = client.put(url)
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED, 'Expected HTTP 405 on PUT.')
         response = client.patch(url)
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED, 'Expected HTTP 405 on PATCH.')
         response = client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED, 'Expected HTTP 405 on DELETE.')
-        response = client.head(url)
-        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED, 'Expected HTTP 405 on DELETE.')
+
+    def test_comments_are_paginated(self):
+        """
+        Test GET on posts/ID/comments returns pages of comments in both storages.
+        """
+        from django.test.utils import override_settings
+        from blog.api_views import COMMENT_PAGINATE_BY
+        for storage in ('embedded', 'kind'):
+            reset_db()
+            p = create_post()
+            client = APIClient()
+            url = '/api/posts/%s/comments' % p.id
+            data = {
+                "author": {"name": "Test", "email": "t@test.com"},
+                "text": "Test"
+            }
+            with override_settings(BLOG_COMMENT_STORAGE=storage):
+                for i in xrange(COMMENT_PAGINATE_BY + 1):
+                    client.post(url, data, format='json')
+            response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected HTTP 200.')
+            content = json.loads(response.content)
+            self.assertEqual(content['count'], COMMENT_PAGINATE_BY + 1)
+            self.assertEqual(len(content['results']), COMMENT_PAGINATE_BY)
+            self.assertIsNotNone(content['next'])
 
     def test_comment_returns_404_on_invalid_post_id(self):
         """
@@ -155,6 +226,39 @@ class BlogAPITests(APITestCase):
         p = Post.objects.get()
         self.assertEqual(len(p.comments), 1)
 
+    def test_comment_in_kind_does_not_save_post(self):
+        """
+        Test posts/ID/comments endpoint with comments stored in their own kind.
+        """
+        from django.db.models import signals
+        from django.test.utils import override_settings
+        reset_db()
+        c = APIClient()
+        p = create_post_with_comments()
+        embedded = len(p.comments)
+        saved = []
+        receiver = lambda sender, **kwargs: saved.append(kwargs['instance'])
+        signals.post_save.connect(receiver, sender=Post)
+        data = {
+            "author": {"name": "Test", "email": "t@test.com"},
+            "text": "Test"
+        }
+        try:
+            with override_settings(BLOG_COMMENT_STORAGE='kind'):
+                response = c.post('/api/posts/%s/comments' % p.id, data, format='json')
+        finally:
+            signals.post_save.disconnect(receiver, sender=Post)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, 'Expected HTTP 201.')
+        self.assertEqual(saved, [])
+        p = Post.objects.get()
+        self.assertIsNone(p.comments)
+        self.assertEqual(p.comment_count, embedded + 1)
+        self.assertEqual(PostComment.objects.filter(post_id=p.id).count(), embedded + 1)
+        response = c.get('/api/posts/%s' % p.id)
+        content = json.loads(response.content)
+        self.assertEqual(content['comment_count'], embedded + 1)
+        self.assertEqual(content['comments'][-1]['text'], 'Test')
+
     def test_POST_posts_is_restricted_to_authenticated_users(self):
         """
         Test POST on /api/posts to create new posts is restricted to authenticated users.
@@ -414,4 +518,53 @@ class BlogAPITests(APITestCase):
         expected = 3
         content = json.loads(response.content)
         self.assertEqual(response.status_code, status.HTTP_200_OK, 'Expected HTTP 200.')
-        self.assertEqual(len(content), expected, 'Expected %s tag, got %s.' % (expected, len(content)))
\ No newline at end of file
+        self.assertEqual(len(content), expected, 'Expected %s tag, got %s.' % (expected, len(content)))
+
+    def test_alltags_drops_tags_no_longer_used(self):
+        """
+        Test alltags endpoint after editing and deleting tagged posts.
+        """
+        reset_db()
+        c = APIClient()
+        p = create_post(tags=['foo', 'tag'])
+        create_post(tags=['tag'])
+        p.tags = ['bar']
+        p.save()
+        response = c.get('/api/alltags')
+        content = json.loads(response.content)
+        self.assertEqual(sorted(content), ['bar', 'tag'], 'Unexpected tags %s.' % content)
+        Post.objects.get(pk=p.pk).delete()
+        self.assertEqual(Tag.objects.get(pk='tag').post_count, 1, 'Expected one post tagged.')
+        response = c.get('/api/alltags')
+        content = json.loads(response.content)
+        self.assertEqual(content, ['tag'], 'Unexpected tags %s.' % content)
+
+    def test_rebuild_tags_command(self):
+        """
+        Test the rebuild_tags management command recreates the tags.
+        """
+        from django.core import management
+        reset_db()
+        create_post(tags=['foo', 'tag'])
+        create_post(tags=['tag'])
+        Tag.objects.all().delete()
+        management.call_command('rebuild_tags', verbosity=0)
+        self.assertEqual(Tag.objects.get(pk='tag').post_count, 2, 'Expected two posts tagged.')
+        self.assertEqual(Tag.objects.get(pk='foo').post_count, 1, 'Expected one post tagged.')
+
+    def test_loaddata_counts_tags(self):
+        """
+        Test loading a fixture of tagged posts creates their tags.
+        """
+        import os
+        from collections import Counter
+        from django.core import management
+        reset_db()
+        path = os.path.join(os.path.dirname(__file__), os.pardir, 'fixtures', 'deployed.json')
+        with open(path) as fixture:
+            expected = Counter(tag for obj in json.load(fixture)
+                               if obj['model'] == 'blog.post'
+                               for tag in set(obj['fields']['tags'] or ()))
+        management.call_command('loaddata', 'deployed.json', verbosity=0)
+        counts = dict((tag.name, tag.post_count) for tag in Tag.objects.all())
+        self.assertEqual(counts, dict(expected), 'Unexpected tag counts %s.' % counts)
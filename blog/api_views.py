@@ -14,12 +14,16 @@ from rest_framework.reverse import reverse
 from rest_framework.status import HTTP_204_NO_CONTENT
 
 from serializers import *
+from pagination import CursorPaginationMixin
 
+COMMENT_PAGINATE_BY = settings.REST_FRAMEWORK.get('COMMENT_PAGINATE_BY', 10)
 
-class PostGenericList(generics.ListCreateAPIView):
+
+class PostGenericList(CursorPaginationMixin, generics.ListCreateAPIView):
     """
     API view for lists of Posts, responds to /api/posts.
     By default we sort by inverse creation date and we paginate.
+    Passing a cursor parameter switches to cursor pagination.
     """
     queryset = Post.objects.all().order_by('-sticky', '-updated_on')
     serializer_class = PostSerializer
@@ -61,6 +65,16 @@ class PostGenericDetail(generics.RetrieveUpdateDestroyAPIView):
             except Post.DoesNotExist:
                 raise Http404
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super(PostGenericDetail, self).retrieve(request, *args, **kwargs)
+        if self.object.comment_count:
+            # comments in their own kind are not loaded with the post, include
+            # the first page, the rest is available at posts/ID/comments.
+            from blog.comments import get_comments
+            comments = get_comments(self.object)[:COMMENT_PAGINATE_BY]
+            response.data['comments'] = CommentSerializer(comments, many=True).data
+        return response
+
     def pre_save(self, obj):
         obj.updated_on = timezone.now()
 
@@ -78,10 +92,11 @@ class PostGenericDetail(generics.RetrieveUpdateDestroyAPIView):
         api_delete_signal.send(sender=None, post_id=obj.id, post_title=obj.title, post_permalink=obj.permalink)
 
 
-class TagGenericList(generics.ListAPIView):
+class TagGenericList(CursorPaginationMixin, generics.ListAPIView):
     """
     API view for lists of Posts tagged with a particular string, responds to /api/posts/tag/TAG.
     By default we sort by inverse creation date and we paginate.
+    Passing a cursor parameter switches to cursor pagination.
     """
     lookup_url_kwarg = 'tag'
     serializer_class = PostSerializer
@@ -126,34 +141,35 @@ class SearchGenericList(generics.ListAPIView):
     def get_queryset(self):
         from search.core import search
         search_terms = self.kwargs.get(self.lookup_url_kwarg)
-        # force the evaluation of the search RelationIndexQuery result as the pagination doesn't seem to like it
-        return [q for q in search(Post, search_terms).order_by('-sticky', '-updated_on')]
+        return search(Post, search_terms).order_by('-sticky', '-updated_on')
 
 
-class CommentsGenericDetail(generics.CreateAPIView):
+class CommentsGenericDetail(generics.ListCreateAPIView):
     """
-    API view for creating comments on a post, responds to /api/posts/ID/comments.
+    API view for listing and creating comments on a post, responds to /api/posts/ID/comments.
+    Comments are listed by creation date and paginated.
     Restricted access on update and delete.
     """
     serializer_class = CommentSerializer
     permission_classes = (permissions.AllowAny,)
+    paginate_by = COMMENT_PAGINATE_BY
 
-    def get_queryset(self):
-        return Post.objects.get(pk=self.kwargs.get(self.lookup_field))
-
-    def pre_save(self, obj):
+    def get_post(self):
         try:
-            post = Post.objects.get(pk=self.kwargs.get(self.lookup_field))
-            if post.comments is None:
-                post.comments = [obj]
-            else:
-                post.comments.append(obj)
-            post.save()
-            from blog.api_signals import api_comment_signal
-            api_comment_signal.send(sender=None, post_id=post.id, post_title=post.title, post_permalink=post.permalink)
+            return Post.objects.get(pk=self.kwargs.get(self.lookup_field))
         except Post.DoesNotExist:
             raise Http404
 
+    def get_queryset(self):
+        from blog.comments import get_comments
+        return get_comments(self.get_post())
+
+    def pre_save(self, obj):
+        from blog.api_signals import api_comment_signal
+        from blog.comments import add_comment
+        post = add_comment(self.get_post(), obj)
+        api_comment_signal.send(sender=None, post_id=post.id, post_title=post.title, post_permalink=post.permalink)
+
 
 class SiteActivityGenericList(generics.ListAPIView):
     """
@@ -178,15 +194,11 @@ class SiteActivityGenericList(generics.ListAPIView):
 def all_tags(request, format=None):
     """
     All-tags endpoint, returns a list of the unique tags in the posts.
+    Tags are keyed by name so this is a single keys only query.
     """
-    if Post.objects.count():
-        unique_tags = []
-        for p in Post.objects.all():
-            if p.tags:
-                for t in p.tags:
-                    unique_tags.append(t)
-
-        return Response(list(set(unique_tags)))
+    unique_tags = list(Tag.objects.values_list('name', flat=True))
+    if unique_tags:
+        return Response(unique_tags)
     else:
         return Response('', status=HTTP_204_NO_CONTENT)
 
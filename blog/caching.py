@@ -0,0 +1,166 @@
+"""
+
+caching.py
+Materialized front page for the home view.
+The first page of posts, its rendered HTML and the JSON blob used to bootstrap
+the Backbone collection are stored in the cache as a single entry, keyed by a
+generation that is bumped whenever a Post is created, updated, deleted or
+commented. A request still building the page of an older generation can only
+store it under its own, no longer used, key.
+
+The posts query is eventually consistent, so the posts written in the last
+HOME_PAGE_RECENT_WRITES_WINDOW seconds are remembered: pages built meanwhile
+read them by key and merge them into the page, and are only cached for
+HOME_PAGE_RECENT_WRITES_TIMEOUT seconds as the total count may still lag.
+
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import signals
+from django.dispatch import receiver
+from blog.models import Post
+from blog.api_signals import api_comment_signal, api_create_signal, \
+    api_update_signal, api_delete_signal
+
+HOME_PAGE_CACHE_KEY = 'blog_home_page'
+HOME_PAGE_GENERATION_KEY = 'blog_home_page_generation'
+HOME_PAGE_RECENT_WRITES_KEY = 'blog_home_page_recent_writes'
+HOME_PAGE_CACHE_TIMEOUT = getattr(settings, 'HOME_PAGE_CACHE_TIMEOUT', 60 * 5)
+HOME_PAGE_RECENT_WRITES_WINDOW = getattr(settings, 'HOME_PAGE_RECENT_WRITES_WINDOW', 60)
+HOME_PAGE_RECENT_WRITES_TIMEOUT = getattr(settings, 'HOME_PAGE_RECENT_WRITES_TIMEOUT', 5)
+
+
+def merge_recent_posts(posts, recent_writes, page_size):
+    """
+    Replaces the posts written recently in a page of posts with their
+    current version, read by key, dropping the deleted ones.
+    Args:
+        posts: Posts returned by the page query, ordered by -sticky, -updated_on.
+        recent_writes: (pk, deleted) tuples.
+        page_size: Number of posts of the page.
+    Returns:
+        The list of posts in the page.
+    """
+    written = set(pk for pk, deleted in recent_writes)
+    posts = [post for post in posts if post.pk not in written]
+    posts.extend(Post.objects.filter(pk__in=[pk for pk, deleted in recent_writes
+                                             if not deleted]))
+    posts.sort(key=lambda post: (post.sticky, post.updated_on), reverse=True)
+    return posts[:page_size]
+
+
+def build_home_page(recent_writes=()):
+    """
+    Runs the home page queries, serialization and rendering.
+    Args:
+        recent_writes: (pk, deleted) tuples of the posts written recently.
+    Returns:
+        A dict with the posts in the first page, their rendered HTML, the
+        JSON representation, the total number of posts and the next page link.
+    """
+    import serializers
+    from django.core.paginator import Page, Paginator
+    from django.template import loader
+    from djangotoolbox.db.utils import count_async, prefetch
+    from rest_framework.renderers import JSONRenderer
+    posts = Post.objects.all().order_by('-sticky', '-updated_on')
+    page_size = settings.REST_FRAMEWORK.get('POST_PAGINATE_BY', 0)
+    # the count and the first page are fetched concurrently.
+    total_posts = count_async(posts)
+    # fetch enough posts to fill the page if some were deleted recently.
+    first_page = prefetch(posts[:page_size + len(recent_writes)])
+    paginator = Paginator(posts, page_size)
+    paginator._count = total_posts.get_result()
+    first_page = list(first_page)
+    if recent_writes:
+        first_page = merge_recent_posts(first_page, recent_writes, page_size)
+    paged_posts = Page(first_page[:page_size], 1, paginator)
+    # no request in the context, the next link is kept relative so the entry
+    # can be shared by every visitor.
+    serializer = serializers.PostPaginationSerializer(paged_posts, context={})
+    page_posts = list(paged_posts.object_list)
+    return {
+        'posts': page_posts,
+        'posts_html': loader.render_to_string('post_list.html', {'posts': page_posts}),
+        'total_posts': paginator.count,
+        'models_json': JSONRenderer().render(serializer.data['results']),
+        'next': serializer.data['next'],
+    }
+
+
+def get_home_page():
+    """
+    Returns the cached front page, building and storing it on a miss.
+    """
+    key = '%s:%s' % (HOME_PAGE_CACHE_KEY, get_home_page_generation())
+    home_page = cache.get(key)
+    if home_page is None:
+        recent_writes = get_recent_writes()
+        home_page = build_home_page(recent_writes)
+        cache.set(key, home_page, HOME_PAGE_RECENT_WRITES_TIMEOUT if recent_writes
+                  else HOME_PAGE_CACHE_TIMEOUT)
+    return home_page
+
+
+def get_home_page_generation():
+    generation = cache.get(HOME_PAGE_GENERATION_KEY)
+    if generation is None:
+        # start from the current time so an evicted counter never goes back
+        # to a generation that is still cached.
+        cache.add(HOME_PAGE_GENERATION_KEY, int(time.time() * 1000))
+        generation = cache.get(HOME_PAGE_GENERATION_KEY)
+    return generation
+
+
+def get_recent_writes():
+    """
+    Returns (pk, deleted) tuples for the posts written in the last
+    HOME_PAGE_RECENT_WRITES_WINDOW seconds.
+    """
+    now = time.time()
+    return [(pk, deleted) for pk, deleted, written_on
+            in cache.get(HOME_PAGE_RECENT_WRITES_KEY, [])
+            if now - written_on < HOME_PAGE_RECENT_WRITES_WINDOW]
+
+
+def invalidate_home_page(pk=None, deleted=False):
+    """
+    Moves the front page to a new generation so the next home view request
+    rebuilds it, remembering the post written if any.
+    """
+    if pk is not None:
+        now = time.time()
+        recent_writes = [(post_pk, post_deleted, written_on) for post_pk, post_deleted, written_on
+                         in cache.get(HOME_PAGE_RECENT_WRITES_KEY, [])
+                         if post_pk != pk and now - written_on < HOME_PAGE_RECENT_WRITES_WINDOW]
+        recent_writes.append((pk, deleted, now))
+        cache.set(HOME_PAGE_RECENT_WRITES_KEY, recent_writes, HOME_PAGE_RECENT_WRITES_WINDOW)
+    try:
+        cache.incr(HOME_PAGE_GENERATION_KEY)
+    except ValueError:
+        cache.set(HOME_PAGE_GENERATION_KEY, int(time.time() * 1000))
+
+
+@receiver(signals.post_save, sender=Post)
+def post_saved_handler(sender, instance, **kwargs):
+    invalidate_home_page(instance.pk)
+
+@receiver(signals.post_delete, sender=Post)
+def post_deleted_handler(sender, instance, **kwargs):
+    invalidate_home_page(instance.pk, deleted=True)
+
+@receiver(api_comment_signal)
+@receiver(api_create_signal)
+@receiver(api_update_signal)
+@receiver(api_delete_signal)
+def api_post_changed_handler(sender, **kwargs):
+    invalidate_home_page(kwargs.get('post_id'),
+                         deleted=kwargs.get('signal') is api_delete_signal)
+
+@receiver(signals.post_syncdb)
+def flush_handler(sender, **kwargs):
+    # flush does not send delete signals for each instance.
+    cache.delete(HOME_PAGE_RECENT_WRITES_KEY)
+    invalidate_home_page()
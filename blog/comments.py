@@ -0,0 +1,218 @@
+"""
+
+comments.py
+Storage of the comments of the posts.
+With the default 'embedded' BLOG_COMMENT_STORAGE comments are kept in the
+comments list of the Post, so every query on posts loads them and every new
+comment rewrites and reindexes the whole post.
+With the 'kind' storage each comment is a PostComment entity whose key name
+is made of the id of its post and its position among the comments, and the
+Post only keeps their number in comment_count. A new comment is a small
+insert plus an update of the count in the same transaction, without sending
+the post_save signal, and comments are read by key rather than queried, so a
+page always lists as many comments as the count says.
+
+The storage can be switched on a live site: posts keep serving their
+embedded comments until they are commented again or moved by the
+migrate_comments command. Switching back to embedded comments after
+migrating is not supported.
+
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import signals
+from django.dispatch import receiver
+from google.appengine.api.datastore import Get, Put
+from djangoappengine.db.utils import commit_locked
+from blog.models import Post, PostComment
+
+COMMENT_STORAGES = ('embedded', 'kind')
+
+# Number of comments read by key at once when iterating over PostComments.
+COMMENT_BATCH_SIZE = 100
+
+
+def stores_comments_in_kind():
+    """
+    Returns True if new comments are stored as PostComment entities.
+    """
+    storage = getattr(settings, 'BLOG_COMMENT_STORAGE', 'embedded')
+    if storage not in COMMENT_STORAGES:
+        raise ImproperlyConfigured('BLOG_COMMENT_STORAGE must be one of %s.' %
+                                   ', '.join(COMMENT_STORAGES))
+    return storage == 'kind'
+
+
+def comment_key(post_id, position):
+    """
+    Returns the primary key of the PostComment at a position of a post.
+    """
+    return u'%s:%d' % (post_id, position)
+
+
+class PostComments(object):
+    """
+    Sequence of the PostComments of a post in creation order.
+    Slices are fetched with a batch get of their keys, which unlike a query
+    on post_id is strongly consistent.
+    """
+    def __init__(self, post_id, total):
+        self.post_id = post_id
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        positions = range(self.total)[index]
+        if isinstance(index, slice):
+            return self._get(positions)
+        return self._get([positions])[0]
+
+    def __iter__(self):
+        for start in xrange(0, self.total, COMMENT_BATCH_SIZE):
+            for comment in self[start:start + COMMENT_BATCH_SIZE]:
+                yield comment
+
+    def _get(self, positions):
+        keys = [comment_key(self.post_id, position) for position in positions]
+        if not keys:
+            return []
+        comments = dict((comment.pk, comment) for comment in
+                        PostComment.objects.filter(pk__in=keys))
+        return [comments[key] for key in keys if key in comments]
+
+
+def get_comments(post):
+    """
+    Returns the comments of a post in creation order.
+    Returns:
+        A PostComments sequence once the post has comments in their own kind,
+        the embedded comments list otherwise.
+    """
+    if post.comment_count:
+        return PostComments(post.pk, post.comment_count)
+    return post.comments or []
+
+
+def add_comment(post, comment):
+    """
+    Adds a comment to a post in the configured storage.
+    Embedded comments are appended and the post is saved. Otherwise a
+    PostComment is created, moving the embedded comments of the post
+    first, and the post entity is only touched to update its count.
+    Args:
+        post: Post to add the comment to.
+        comment: Comment instance.
+    Returns:
+        The post, with its comments or comment count updated.
+    """
+    if not stores_comments_in_kind():
+        if post.comments is None:
+            post.comments = [comment]
+        else:
+            post.comments.append(comment)
+        post.save()
+        return post
+
+    migrate_post_comments(post)
+    post.comment_count = insert_comment(post.pk, comment)
+    return post
+
+
+def migrate_post_comments(post):
+    """
+    Moves the embedded comments of a post to PostComment entities.
+    Keys are derived from the position of each comment, so a move interrupted
+    or run concurrently rewrites the same entities rather than duplicating them.
+    Args:
+        post: Post to migrate, updated in place.
+    Returns:
+        The number of comments moved.
+    """
+    comments, count = post.comments, post.comment_count or 0
+    while comments:
+        PostComment.objects.bulk_create([
+            PostComment(id=comment_key(post.pk, count + index),
+                        post_id=post.pk,
+                        author=comment.author,
+                        text=comment.text,
+                        created_on=comment.created_on)
+            for index, comment in enumerate(comments)])
+        if detach_comments(post.pk, len(comments), count):
+            post.comments = None
+            post.comment_count = count + len(comments)
+            return len(comments)
+        # comments were added or moved meanwhile, start over.
+        comments, count = Post.objects.values_list(
+            'comments', 'comment_count').get(pk=post.pk)
+        count = count or 0
+    post.comments = None
+    return 0
+
+
+def get_post_entity(post_id):
+    """
+    Returns the datastore entity of a post, read by key.
+    The helpers below change the entity directly, as an update() query
+    would open a transaction of its own inside theirs.
+    """
+    connection = connections[Post.objects.db]
+    return Get(connection.ops.value_for_db(post_id, Post._meta.pk))
+
+
+@commit_locked
+def detach_comments(post_id, moved, count):
+    """
+    Clears the embedded comments of a post once copied to their own kind and
+    adds them to its comment count.
+    Args:
+        post_id: Primary key of the post.
+        moved: Number of embedded comments copied.
+        count: Comment count of the post when they were copied.
+    Returns:
+        True, or False if the embedded comments or the count changed since
+        the comments were copied.
+    """
+    entity = get_post_entity(post_id)
+    comments_column = Post._meta.get_field('comments').column
+    count_column = Post._meta.get_field('comment_count').column
+    if (len(entity.get(comments_column) or ()) != moved or
+            (entity.get(count_column) or 0) != count):
+        return False
+    entity[comments_column] = None
+    entity[count_column] = count + moved
+    Put(entity)
+    return True
+
+
+@commit_locked(xg=True)
+def insert_comment(post_id, comment):
+    """
+    Stores a comment at the next position of a post and increments the
+    comment count of the post, in a single cross-group transaction.
+    Returns:
+        The new comment count.
+    """
+    entity = get_post_entity(post_id)
+    count_column = Post._meta.get_field('comment_count').column
+    count = entity.get(count_column) or 0
+    PostComment.objects.create(id=comment_key(post_id, count),
+                               post_id=post_id,
+                               author=comment.author,
+                               text=comment.text,
+                               created_on=comment.created_on)
+    entity[count_column] = count + 1
+    Put(entity)
+    return count + 1
+
+
+@receiver(signals.post_delete, sender=Post)
+def post_delete_handler(sender, instance, **kwargs):
+    for start in xrange(0, instance.comment_count or 0, COMMENT_BATCH_SIZE):
+        PostComment.objects.filter(pk__in=[
+            comment_key(instance.pk, position) for position in
+            xrange(start, min(start + COMMENT_BATCH_SIZE,
+                              instance.comment_count))]).delete()
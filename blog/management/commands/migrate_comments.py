@@ -0,0 +1,64 @@
+from optparse import make_option
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+CHECKPOINT_KEY = 'migrate_comments'
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', action='store', dest='batch_size',
+            type='int', default=100,
+            help='Number of posts read per batch.'),
+        make_option('--cursor', action='store', dest='cursor', default=None,
+            help='Datastore cursor to start from.'),
+        make_option('--resume', action='store_true', dest='resume',
+            default=False,
+            help='Start from the checkpoint saved by an interrupted run.'),
+    )
+    help = "Moves the embedded comments of the posts to their own kind, " \
+           "walking the posts in key order. Requires the 'kind' " \
+           "BLOG_COMMENT_STORAGE, the site can keep running meanwhile."
+
+    def handle(self, *args, **options):
+        from djangoappengine.db.utils import get_cursor, set_cursor
+        from blog.comments import migrate_post_comments, stores_comments_in_kind
+        from blog.models import Post
+
+        if not stores_comments_in_kind():
+            raise CommandError("Set BLOG_COMMENT_STORAGE to 'kind' before "
+                               "migrating, or new comments would keep being "
+                               "embedded in migrated posts.")
+
+        verbosity = int(options.get('verbosity', 1))
+        batch_size = options['batch_size']
+        cursor = options['cursor']
+        if options['resume']:
+            cursor = cache.get(CHECKPOINT_KEY)
+
+        posts = comments = 0
+        while True:
+            queryset = Post.objects.order_by('pk')
+            if cursor:
+                queryset = set_cursor(queryset, start=cursor)
+            queryset = queryset[:batch_size]
+            batch = list(queryset)
+            for post in batch:
+                moved = migrate_post_comments(post)
+                if moved:
+                    posts += 1
+                    comments += moved
+            if len(batch) < batch_size:
+                break
+            cursor = get_cursor(queryset)
+            # Checkpoint after every batch so an interrupted run can resume
+            cache.set(CHECKPOINT_KEY, cursor, 60 * 60 * 24)
+            if verbosity >= 2:
+                self.stdout.write("Migrated %d comments of %d posts, cursor: %s\n" %
+                                  (comments, posts, cursor))
+
+        cache.delete(CHECKPOINT_KEY)
+        if verbosity >= 1:
+            self.stdout.write("Migrated %d comments of %d posts.\n" %
+                              (comments, posts))
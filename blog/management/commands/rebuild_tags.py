@@ -0,0 +1,12 @@
+from django.core.management.base import NoArgsCommand
+
+
+class Command(NoArgsCommand):
+    help = "Rebuilds the Tag aggregate from the tags of every post."
+
+    def handle_noargs(self, **options):
+        from blog.tag_index import rebuild_tags
+        verbosity = int(options.get('verbosity', 1))
+        count = rebuild_tags()
+        if verbosity >= 1:
+            self.stdout.write("Rebuilt %d tags.\n" % count)
@@ -6,6 +6,8 @@ from djangotoolbox.fields import ListField, EmbeddedModelField
 class Post(models.Model):
     """
     Basic model for blog posts, includes comments and tags as lists.
+    Comments stored in their own kind are counted in comment_count instead,
+    see blog.comments.
     """
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=255)
@@ -14,6 +16,7 @@ class Post(models.Model):
     text = models.TextField()
     tags = ListField(blank=True, null=True)
     comments = ListField(EmbeddedModelField('Comment'), blank=True, null=True)
+    comment_count = models.IntegerField(default=0)
     created_on = models.DateTimeField(default=timezone.now, blank=True, null=True)
     updated_on = models.DateTimeField(default=timezone.now, blank=True, null=True)
     sticky = models.BooleanField(default=False)
@@ -44,6 +47,13 @@ class Post(models.Model):
     def save(self, *args, **kwargs):
         self.permalink = self.create_permalink_from_title()
         super(Post, self).save(*args, **kwargs)
+
+    @property
+    def num_comments(self):
+        """
+        Number of comments of the post, embedded or in their own kind.
+        """
+        return len(self.comments or ()) + self.comment_count
     
     def __unicode__(self):
         return '%s - %s ...' % (self.title, self.text[:30].replace('\n', ''))
@@ -61,6 +71,22 @@ class Comment(models.Model):
         return u'%s: %s' % (self.author.name, self.text[:50] )
 
 
+class PostComment(models.Model):
+    """
+    Comment stored in its own kind, keyed by the id of its post and its
+    position among the comments of the post (see blog.comments).
+    Used instead of the embedded comments with the 'kind' comment storage.
+    """
+    id = models.CharField(max_length=255, primary_key=True)
+    post_id = models.IntegerField()
+    author = EmbeddedModelField('Author')
+    text = models.TextField()
+    created_on = models.DateTimeField(default=timezone.now, blank=True, null=True)
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.author.name, self.text[:50] )
+
+
 class Author(models.Model):
     """
     Author model used in Comments
@@ -90,3 +116,23 @@ class SiteActivity(models.Model):
 
     def __unicode__(self):
         return u'%s activity on post: %s' % (self.task, self.post_title)
+
+
+class Tag(models.Model):
+    """
+    Aggregate of the tags used in posts, keyed by the tag name.
+    Maintained incrementally on Post save and delete, see tag_index.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    post_count = models.IntegerField(default=0)
+    last_used_on = models.DateTimeField(default=timezone.now)
+
+    def __unicode__(self):
+        return u'%s (%s posts)' % (self.name, self.post_count)
+
+
+# Connect the receivers that keep the cached front page, tags and comments
+# up to date.
+import blog.caching
+import blog.comments
+import blog.tag_index
@@ -0,0 +1,121 @@
+"""
+
+pagination.py
+Cursor based pagination for post lists.
+Offset slicing makes the datastore scan and discard every skipped entity, so
+deep pages get linearly slower. Resuming from the datastore cursor of the
+previous page keeps every page at the cost of the page size.
+
+"""
+
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from google.appengine.api.datastore_errors import BadValueError
+from djangoappengine.db.utils import get_cursor, set_cursor
+from rest_framework import serializers
+from rest_framework.pagination import BasePaginationSerializer
+from rest_framework.templatetags.rest_framework import replace_query_param
+
+CURSOR_QUERY_PARAM = 'cursor'
+
+
+def fetch_page(queryset, page_size, cursor=None, offset=0):
+    """
+    Fetches a page of results resuming from a websafe datastore cursor.
+    Args:
+        queryset: QuerySet to paginate, must be ordered.
+        page_size: Maximum number of results in the page.
+        cursor: Optional websafe cursor string returned for the previous page.
+        offset: Optional number of results to skip, only used without cursor.
+    Returns:
+        A tuple with the list of results and the cursor for the next page,
+        or None if there are no more results.
+    Raises:
+        InvalidPage if the cursor could not be decoded.
+    """
+    if cursor:
+        try:
+            queryset = set_cursor(queryset, start=cursor)
+        except BadValueError:
+            raise InvalidPage('Invalid cursor: %s' % cursor)
+        offset = 0
+    page = queryset[offset:offset + page_size]
+    results = list(page)
+    next_cursor = None
+    if len(results) == page_size:
+        # queries combining several sub-queries (__in with multiple values)
+        # do not expose a cursor and stop here.
+        next_cursor = get_cursor(page)
+    return results, next_cursor
+
+
+class CursorPage(object):
+    """
+    Page-like object holding the results of a cursor paginated query.
+    The total count is only known on the first page.
+    """
+    def __init__(self, object_list, next_cursor, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.count = count
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class NextCursorField(serializers.Field):
+    """
+    Field that returns a link to the next page using the datastore cursor.
+    """
+    cursor_field = CURSOR_QUERY_PARAM
+
+    def to_native(self, value):
+        if not value.has_next():
+            return None
+        request = self.context.get('request')
+        url = request and request.build_absolute_uri() or ''
+        return replace_query_param(url, self.cursor_field, value.next_cursor)
+
+
+class CursorPaginationSerializer(BasePaginationSerializer):
+    """
+    Pagination serializer for CursorPage objects, previous links are not
+    supported as datastore cursors only move forward.
+    """
+    count = serializers.Field(source='count')
+    next = NextCursorField(source='*')
+
+
+class CursorPaginationMixin(object):
+    """
+    Mixin for list views switching to cursor pagination when the cursor query
+    parameter is present in the request, an empty value requests the first page.
+    Page number pagination is kept otherwise.
+    """
+    cursor_query_param = CURSOR_QUERY_PARAM
+
+    def paginate_queryset(self, queryset, page_size=None):
+        cursor = self.request.QUERY_PARAMS.get(self.cursor_query_param, None)
+        if cursor is None:
+            return super(CursorPaginationMixin, self).paginate_queryset(
+                queryset, page_size)
+        page_size = page_size or self.get_paginate_by()
+        try:
+            object_list, next_cursor = fetch_page(queryset, page_size, cursor)
+        except InvalidPage, e:
+            raise Http404(str(e))
+        count = None if cursor else queryset.count()
+        return CursorPage(object_list, next_cursor, count)
+
+    def get_pagination_serializer(self, page):
+        if not isinstance(page, CursorPage):
+            return super(CursorPaginationMixin, self).get_pagination_serializer(page)
+
+        class SerializerClass(CursorPaginationSerializer):
+            class Meta:
+                object_serializer_class = self.get_serializer_class()
+
+        return SerializerClass(instance=page, context=self.get_serializer_context())
@@ -10,5 +10,10 @@ import search
 from search.core import porter_stemmer
 from blog.models import Post
 
-# Create indexes on title and text fields.
-search.register( Post, ('title', 'text', ), indexer=porter_stemmer)
\ No newline at end of file
+# Create indexes on title and text fields, words in the title weigh more
+# when ranking results by relevance. Only the fields search results are
+# ordered by are integrated, so saving a post for a new comment or tag
+# leaves its relation index alone.
+search.register( Post, ('title', 'text', ), indexer=porter_stemmer,
+                 integrate=('sticky', 'updated_on', 'created_on'),
+                 field_weights={'title': 3, 'text': 1})
\ No newline at end of file
@@ -4,6 +4,7 @@
 
 """
 
+from django.db.models.query import QuerySet
 from rest_framework import serializers
 from rest_framework.pagination import PaginationSerializer
 from blog.models import *
@@ -36,19 +37,49 @@ class PostSerializer(serializers.ModelSerializer):
     """
     Post serializer, adds nested comments and readable date from Datetime
     object from model declaration.
+    Comments stored in their own kind are not nested, only counted.
     """
     user_id = serializers.Field(source='user_id')
     user_name = serializers.Field(source='user_id')
     permalink = serializers.Field(source='permalink')
     comments = CommentSerializer(many=True, required=False)
+    comment_count = serializers.Field(source='num_comments')
     tags = serializers.CharField(source='tags', required=False)
     created_on_readable = serializers.Field(source='created_on')
     updated_on_readable = serializers.Field(source='updated_on')
     timestamp = serializers.Field(source='updated_on')
 
-    def transform_user_name(self, obj, value):
+    def prefetch_user_names(self, posts):
+        """
+        Resolves the user names of the posts with a single batch get,
+        memoized in the serializer context so each user is fetched once.
+        Returns:
+            A dict of user names keyed by user id.
+        """
         from django.contrib.auth.models import User
-        return User.objects.get(pk=value).username
+        user_names = self.context.setdefault('user_names', {})
+        missing = set(p.user_id for p in posts if p.user_id is not None) - set(user_names)
+        if missing:
+            user_names.update(User.objects.filter(
+                pk__in=list(missing)).values_list('pk', 'username'))
+        return user_names
+
+    def field_to_native(self, obj, field_name):
+        # nested in a pagination serializer obj is the page, prefetch the
+        # users for all the posts in it.
+        posts = getattr(obj, self.source or field_name, None)
+        if isinstance(posts, (list, tuple, QuerySet)):
+            self.prefetch_user_names(posts)
+        return super(PostSerializer, self).field_to_native(obj, field_name)
+
+    @property
+    def data(self):
+        if self._data is None and isinstance(self.object, (list, tuple, QuerySet)):
+            self.prefetch_user_names(self.object)
+        return super(PostSerializer, self).data
+
+    def transform_user_name(self, obj, value):
+        return self.prefetch_user_names([obj]).get(value)
 
     def transform_created_on_readable(self, obj, value):
         return value.strftime('%A %d %b %Y - %H:%M:%S')
@@ -83,7 +114,8 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = (
             'id', 'title', 'permalink', 'user_name', 'user_id', 'text',
-            'tags', 'comments', 'created_on_readable', 'updated_on_readable',
+            'tags', 'comments', 'comment_count', 'created_on_readable',
+            'updated_on_readable',
             'timestamp', 'sticky'
         )
 
@@ -0,0 +1,94 @@
+"""
+
+tag_index.py
+Receivers keeping the Tag aggregate in sync with the tags of the posts.
+Only the tags added to or removed from a post since it was loaded are
+written, so saving a post without changing its tags costs nothing.
+
+"""
+
+from django.db.models import signals
+from django.dispatch import receiver
+from django.utils import timezone
+from djangoappengine.db.utils import commit_locked
+from blog.models import Post, Tag
+
+
+def get_tag_set(tags):
+    """
+    Returns the set of tags of a post, tolerating empty or malformed values.
+    """
+    if not isinstance(tags, (list, tuple)):
+        return set()
+    return set(tags)
+
+
+@commit_locked
+def update_tag(name, delta, used_on=None):
+    """
+    Adds delta to the post count of a tag, creating it if needed and
+    removing it once no post uses it.
+    Args:
+        name: Name of the tag.
+        delta: Number of posts to add or subtract.
+        used_on: Optional datetime the tag was last added to a post.
+    """
+    try:
+        tag = Tag.objects.get(pk=name)
+    except Tag.DoesNotExist:
+        tag = Tag(name=name, post_count=0)
+    tag.post_count += delta
+    if tag.post_count > 0:
+        if used_on:
+            tag.last_used_on = used_on
+        tag.save()
+    else:
+        Tag.objects.filter(pk=name).delete()
+
+
+def rebuild_tags():
+    """
+    Rebuilds the Tag aggregate from scratch iterating over every post.
+    Returns:
+        The number of unique tags.
+    """
+    from collections import Counter
+    counts = Counter()
+    last_used = {}
+    for post in Post.objects.all():
+        used_on = post.updated_on or timezone.now()
+        for name in get_tag_set(post.tags):
+            counts[name] += 1
+            if name not in last_used or used_on > last_used[name]:
+                last_used[name] = used_on
+    Tag.objects.all().delete()
+    for name, count in counts.items():
+        Tag.objects.create(name=name, post_count=count, last_used_on=last_used[name])
+    return len(counts)
+
+
+@receiver(signals.post_init, sender=Post)
+def post_init_handler(sender, instance, **kwargs):
+    # remember the stored tags to compute the difference on save.
+    instance._stored_tags = get_tag_set(instance.tags) if instance.pk else set()
+
+@receiver(signals.post_save, sender=Post)
+def post_save_handler(sender, instance, **kwargs):
+    tags = get_tag_set(instance.tags)
+    if kwargs.get('created'):
+        # instances built with a pk, e.g. by loaddata, only look stored.
+        stored_tags = set()
+    else:
+        stored_tags = getattr(instance, '_stored_tags', set())
+    now = timezone.now()
+    for name in tags - stored_tags:
+        update_tag(name, 1, now)
+    for name in stored_tags - tags:
+        update_tag(name, -1)
+    instance._stored_tags = tags
+
+@receiver(signals.post_delete, sender=Post)
+def post_delete_handler(sender, instance, **kwargs):
+    for name in getattr(instance, '_stored_tags', set()):
+        update_tag(name, -1)
+    instance._stored_tags = set()
@@ -29,6 +29,53 @@ class BlogTests(TestCase):
             self.assertIsNotNone( c.author, 'No author in comment:\n %s.' % c)
             self.assertIsNotNone( c.text, 'No text in comment:\n %s.' % c)
 
+    def test_migrate_comments(self):
+        """Test moving embedded comments to their own kind.
+
+        """
+        import os
+        from django.test.utils import override_settings
+        from blog.comments import get_comments
+        reset_db()
+        p = create_post_with_comments()
+        texts = [c.text for c in p.comments]
+        # refused with embedded comment storage.
+        self.assertRaises(SystemExit, management.call_command,
+                          'migrate_comments', verbosity=0,
+                          stderr=open(os.devnull, 'w'))
+        with override_settings(BLOG_COMMENT_STORAGE='kind'):
+            management.call_command('migrate_comments', verbosity=0)
+            # running it again does not duplicate comments.
+            management.call_command('migrate_comments', verbosity=0)
+        p = Post.objects.get()
+        self.assertIsNone(p.comments)
+        self.assertEqual(p.num_comments, len(texts))
+        self.assertEqual([c.text for c in get_comments(p)], texts)
+        p.delete()
+        self.assertEqual(PostComment.objects.count(), 0)
+
+    def test_add_comment_in_kind(self):
+        """Test adding comments to a post with comments in their own kind.
+
+        """
+        from django.test.utils import override_settings
+        from blog.comments import add_comment, get_comments
+        reset_db()
+        p = create_post_with_comments()
+        texts = [c.text for c in p.comments]
+        with override_settings(BLOG_COMMENT_STORAGE='kind'):
+            for i in range(2):
+                comment = create_comment()
+                texts.append(comment.text)
+                p = add_comment(p, comment)
+        self.assertIsNone(p.comments)
+        self.assertEqual(p.comment_count, len(texts))
+        p = Post.objects.get()
+        self.assertIsNone(p.comments)
+        self.assertEqual(p.comment_count, len(texts))
+        self.assertEqual([c.text for c in get_comments(p)], texts)
+        self.assertEqual([c.text for c in get_comments(p)[-2:]], texts[-2:])
+
     def test_home_view_with_no_posts(self):
         """Test home view in case there are no posts in the database.
 
@@ -63,6 +110,46 @@ class BlogTests(TestCase):
         self.assertEqual(response.status_code, 200, 'HTTP error.')
         self.assertEqual(len(response.context['posts']), INITIAL_POSTS, 'Unexpected number of posts.')
 
+    def test_home_view_cache_invalidated_on_new_post(self):
+        """Test the cached front page is rebuilt after a post is created.
+
+        """
+        reset_db()
+        c = Client()
+        response = c.get(reverse('blog.views.home_view') )
+        self.assertEqual(len(response.context['posts']), 0, 'Expected no posts.')
+        create_post()
+        response = c.get(reverse('blog.views.home_view') )
+        self.assertEqual(response.status_code, 200, 'HTTP error.')
+        self.assertEqual(len(response.context['posts']), 1, 'Stale front page served from cache.')
+        self.assertEqual(response.context['total_posts'], 1, 'Stale post count served from cache.')
+
+    def test_home_view_lists_post_not_yet_indexed(self):
+        """Test a post saved right before rendering the home page is listed
+        even if the posts query does not see it yet.
+
+        """
+        from google.appengine.api import apiproxy_stub_map
+        from google.appengine.datastore import datastore_stub_util
+        reset_db()
+        c = Client()
+        create_post()
+        response = c.get(reverse('blog.views.home_view') )
+        self.assertEqual(len(response.context['posts']), 1, 'Expected one post.')
+        stub = apiproxy_stub_map.apiproxy.GetStub('datastore_v3')
+        # queries never see writes they are not forced to apply.
+        stub.SetConsistencyPolicy(
+            datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=0))
+        try:
+            p = create_post()
+            response = c.get(reverse('blog.views.home_view') )
+        finally:
+            stub.SetConsistencyPolicy(
+                datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1))
+        self.assertEqual(response.status_code, 200, 'HTTP error.')
+        self.assertEqual(len(response.context['posts']), 2, 'New post missing from the front page.')
+        self.assertEqual(response.context['posts'][0].pk, p.pk, 'New post is not the first one.')
+
     def test_single_post_view(self):
         """Test post view with a sample post.
 
@@ -4,7 +4,6 @@
 
 """
 
-from django.core.paginator import Paginator
 from django.conf import settings
 from django.contrib import messages
 from django.shortcuts import render, get_object_or_404
@@ -18,21 +17,16 @@ MESSAGE_TAGS = {messages.ERROR: 'danger'}
 
 def home_view(request):
     """
-    Home view, retrieves the first few posts from the database.
+    Home view, retrieves the first few posts from the cached front page.
+    See blog.caching for details.
     """
-    import serializers
-    from rest_framework.renderers import JSONRenderer
-    posts = Post.objects.all().order_by('-sticky', '-updated_on')
-    total_posts = posts.count()
-    paginator = Paginator(posts, INITIAL_POSTS)
-    paged_posts = paginator.page(1)
-    serializer = serializers.PostPaginationSerializer(
-        paged_posts, context={'request': request})
-    paginated_models_json = JSONRenderer().render(serializer.data['results'])
-    return render(request, 'home.html', {'posts': paged_posts,
-                                         'total_posts': total_posts,
-                                         'models_json': paginated_models_json,
-                                         'next': serializer.data['next'],
+    from blog.caching import get_home_page
+    home_page = get_home_page()
+    return render(request, 'home.html', {'posts': home_page['posts'],
+                                         'posts_html': home_page['posts_html'],
+                                         'total_posts': home_page['total_posts'],
+                                         'models_json': home_page['models_json'],
+                                         'next': home_page['next'],
                                          })
 
 
@@ -65,7 +59,10 @@ def post_view(request, post_id=None, permalink=None):
         else:
             forms = add_css_classes(
                 AuthorForm(error_class=BlogErrorList), CommentForm(error_class=BlogErrorList))
-        return render(request, 'post.html', {'post': post, 'forms': forms})
+        from blog.comments import get_comments
+        return render(request, 'post.html', {'post': post,
+                                             'comments': get_comments(post),
+                                             'forms': forms})
 
 
 def tag_view(request, tag_name):
@@ -225,16 +222,19 @@ def delete_post_view(request, post_id):
 
 def search_view(request):
     """Search view, handles searching on posts based on arbitrary strings.
+    Results are sorted by date unless ordering by relevance is requested.
     See search_indexes for details.
 
     """
-    from search.core import search
+    from search.core import search, ranked_search
     search_terms = request.GET.get('q', None)
     if search_terms:
-        total_posts = search(Post, search_terms).order_by(
-            '-sticky', '-updated_on').count()
-        sliced_posts = search(Post, search_terms).order_by(
-            '-sticky', '-updated_on')[:INITIAL_POSTS]
+        posts = search(Post, search_terms).order_by('-sticky', '-updated_on')
+        total_posts = posts.count()
+        if request.GET.get('order', None) == 'relevance':
+            sliced_posts = ranked_search(Post, search_terms, INITIAL_POSTS)
+        else:
+            sliced_posts = posts[:INITIAL_POSTS]
     else:
         total_posts = 0
         sliced_posts = None
@@ -249,9 +249,10 @@ def load_posts_view(request):
     """
     import json
     if request.method == 'GET':
-        results, start = get_more_posts(request.GET)
+        results, start, cursor = get_more_posts(request.GET)
         json_result = json.dumps({'posts': results,
-                                  'start': start
+                                  'start': start,
+                                  'cursor': cursor
                                   })
         return HttpResponse(json_result, mimetype='application/json')
     else:
@@ -283,17 +284,15 @@ def add_css_classes(*forms):
 def save_comment(post, author_form, comment_form):
     """
     Comment form is valid, update the post with the new comment.
+    See blog.comments for the comment storages.
     """
     from blog.api_signals import api_comment_signal
+    from blog.comments import add_comment
     a = Author.objects.create(name=author_form.cleaned_data[
                               'name'], email=author_form.cleaned_data['email'])
     c = Comment.objects.create(
         author=a, text=comment_form.cleaned_data['text'])
-    if not post.comments:
-        post.comments = [c]
-    else:
-        post.comments.append(c)
-    post.save()
+    post = add_comment(post, c)
     api_comment_signal.send(
         sender=None, post_id=post.id, post_title=post.title)
     return post
@@ -302,35 +301,48 @@ def save_comment(post, author_form, comment_form):
 def get_more_posts(GET):
     """
     Function to retrieve additional posts.
+    Home and tag pages resume from the datastore cursor passed in the
+    request, if any, instead of skipping the first start posts, and return
+    the cursor to be passed on the following request.
+    Returns:
+        A tuple with the rendered posts, the start of the next page and
+        the cursor for the next page.
     """
     from django.template import Context, loader
     page = GET.get('page', None)
     start = int(GET.get('start', 0))
     total = int(GET.get('total', 0))
+    cursor = GET.get('cursor', None)
+    next_cursor = None
     if start and total and page and start < total:
         end = start + INITIAL_POSTS if start + INITIAL_POSTS < total else total
         if page == 'home':
-            posts = Post.objects.all().order_by(
-                '-sticky', '-updated_on')[start:end]
+            posts = Post.objects.all().order_by('-sticky', '-updated_on')
         elif page == 'search':
             from search.core import search
             search_terms = GET['terms']
-            raw_posts = search(Post, search_terms).order_by(
-                '-sticky', '-updated_on')
-            # slicing a search result seems to give empty lists?
-            posts = [raw_posts[p] for p in range(start, end)]
+            posts = search(Post, search_terms).order_by(
+                '-sticky', '-updated_on')[start:end]
         elif page == 'tag':
             tag_name = GET['terms']
-            posts = Post.objects.filter(tags__in=[tag_name])[start:end]
+            posts = Post.objects.filter(tags__in=[tag_name])
         else:
-            return None
+            return '', 0, None
+
+        if page != 'search':
+            from django.core.paginator import InvalidPage
+            from blog.pagination import fetch_page
+            try:
+                posts, next_cursor = fetch_page(posts, end - start, cursor, start)
+            except InvalidPage:
+                return '', 0, None
 
         t = loader.get_template('post_list.html')
         if len(posts) == 0:
-            return '', 0
+            return '', 0, None
         else:
             d = {'posts': posts}
 
-        return t.render(Context(d)), start + INITIAL_POSTS
+        return t.render(Context(d)), start + INITIAL_POSTS, next_cursor
     else:
-        return '', 0
+        return '', 0, None
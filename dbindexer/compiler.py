@@ -24,9 +24,19 @@ class SQLCompiler(BaseCompiler):
         return super(SQLCompiler, self).execute_sql(*args, **kwargs)
 
     def results_iter(self):
-        self.convert_filters()
+        # prefetched results were fetched with the filters converted
+        if getattr(self.query, '_nonrel_results', None) is None:
+            self.convert_filters()
         return super(SQLCompiler, self).results_iter()
 
+    def results_iter_async(self):
+        self.convert_filters()
+        return super(SQLCompiler, self).results_iter_async()
+
+    def get_count_async(self):
+        self.convert_filters()
+        return super(SQLCompiler, self).get_count_async()
+
     def has_results(self):
         self.convert_filters()
         return super(SQLCompiler, self).has_results()
@@ -1,27 +1,37 @@
+from bson.son import SON
+
+
 class MongoAggregate(object):
+    """
+    Compiles a Django aggregate to the accumulator of a ``$group``
+    stage of an aggregation pipeline.
+
+    :param alias: Name of the aggregate in the results
+    :param lookup: Document field to aggregate, None for all documents
+    :param source: Aggregated model field
+    """
     is_ordinal = False
     is_computed = False
-    reduce_template = NotImplemented
-    finalize_template = ''
+    operator = NotImplemented
 
-    def __init__(self, alias, lookup, source):
+    def __init__(self, alias, lookup, source, **extra):
         self.alias = alias
         self.lookup = lookup
         self.field = self.source = source
+        self.extra = extra
 
-    def format(self, template):
-        alias = 'out.%s' % self.alias
-        lookup = 'doc.%s' % self.lookup
-        return template.format(alias=alias, lookup=lookup)
-
-    def initial(self):
-        return {self.alias: self.initial_value}
+    def group(self):
+        """
+        Returns the accumulator computing the aggregate in ``$group``.
+        """
+        return {self.operator: '$' + self.lookup}
 
-    def reduce(self):
-        return self.format(self.reduce_template)
-
-    def finalize(self):
-        return self.format(self.finalize_template)
+    def project(self):
+        """
+        Returns the ``$project`` expression computing the aggregate from
+        the accumulator.
+        """
+        return True
 
     def as_sql(self):
         raise NotImplementedError
@@ -29,35 +39,39 @@ class MongoAggregate(object):
 
 class Count(MongoAggregate):
     is_ordinal = True
-    initial_value = 0
-    reduce_template = '{alias}++'
+
+    def group(self):
+        if self.lookup is None:
+            return {'$sum': 1}
+        if self.extra.get('distinct'):
+            return {'$addToSet': '$' + self.lookup}
+        # Like COUNT(column), documents with a null or missing value
+        # don't count.
+        return {'$sum': {'$cond': [
+            {'$eq': [{'$ifNull': ['$' + self.lookup, None]}, None]}, 0, 1]}}
+
+    def project(self):
+        if self.lookup is not None and self.extra.get('distinct'):
+            return {'$size': {'$setDifference': ['$' + self.alias, [None]]}}
+        return True
 
 
 class Min(MongoAggregate):
-    initial_value = float('inf')
-    reduce_template = '{alias} = ({lookup} < {alias}) ? {lookup}: {alias}'
+    operator = '$min'
 
 
 class Max(MongoAggregate):
-    initial_value = float('-inf')
-    reduce_template = '{alias} = ({lookup} > {alias}) ? {lookup}: {alias}'
+    operator = '$max'
 
 
 class Avg(MongoAggregate):
     is_computed = True
-
-    def initial(self):
-        return {'%s__count' % self.alias: 0, '%s__total' % self.alias: 0}
-
-    reduce_template = '{alias}__count++; {alias}__total += {lookup}'
-    finalize_template = '{alias} = {alias}__total / {alias}__count'
+    operator = '$avg'
 
 
 class Sum(MongoAggregate):
     is_computed = True
-    initial_value = 0
-
-    reduce_template = '{alias} += {lookup}'
+    operator = '$sum'
 
 
 _AGGREGATION_CLASSES = dict((cls.__name__, cls)
@@ -65,3 +79,45 @@ _AGGREGATION_CLASSES = dict((cls.__name__, cls)
 
 def get_aggregation_class_by_name(name):
     return _AGGREGATION_CLASSES[name]
+
+
+def build_pipeline(match, group_by, aggregates, ordering=(), offset=0,
+                   limit=None):
+    """
+    Returns the aggregation pipeline computing ``aggregates`` over the
+    documents matching ``match``: a ``$match``, a ``$group`` and, as
+    needed, ``$project``, ``$sort``, ``$skip`` and ``$limit`` stages.
+
+    Group values are returned in the ``_id`` document of the results,
+    aggregates under their alias.
+
+    :param match: Query document selecting the aggregated documents
+    :param group_by: Document fields to group by, all the documents
+                     are aggregated together if empty
+    :param aggregates: MongoAggregate instances
+    :param ordering: (name, direction) tuples, names are group fields
+                     or aggregate aliases
+    """
+    pipeline = []
+    if match:
+        pipeline.append({'$match': match})
+
+    group = {'_id': dict((field, '$' + field) for field in group_by)
+                    if group_by else None}
+    projection = {'_id': True}
+    for aggregate in aggregates:
+        group[aggregate.alias] = aggregate.group()
+        projection[aggregate.alias] = aggregate.project()
+    pipeline.append({'$group': group})
+    if any(value is not True for value in projection.itervalues()):
+        pipeline.append({'$project': projection})
+
+    if ordering:
+        pipeline.append({'$sort': SON(
+            (name if name not in group_by else '_id.' + name, direction)
+            for name, direction in ordering)})
+    if offset:
+        pipeline.append({'$skip': offset})
+    if limit is not None:
+        pipeline.append({'$limit': limit})
+    return pipeline
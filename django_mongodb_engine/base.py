@@ -1,4 +1,3 @@
-import copy
 import datetime
 import decimal
 import sys
@@ -9,7 +8,6 @@ from django.db.backends.signals import connection_created
 from django.db.utils import DatabaseError
 
 from pymongo.collection import Collection
-from pymongo.connection import Connection
 
 # handle pymongo backward compatibility
 try:
@@ -29,6 +27,7 @@ from djangotoolbox.db.base import (
 from djangotoolbox.db.utils import decimal_to_string
 
 from .creation import DatabaseCreation
+from .pool import pool
 from .utils import CollectionDebugWrapper
 
 
@@ -40,6 +39,10 @@ class DatabaseFeatures(NonrelDatabaseFeatures):
 class DatabaseOperations(NonrelDatabaseOperations):
     compiler_module = __name__.rsplit('.', 1)[0] + '.compiler'
 
+    # Maximum number of documents in a bulk write (maxWriteBatchSize),
+    # the driver splits larger messages by size.
+    max_insert_batch_size = 1000
+
     def max_name_length(self):
         return 254
 
@@ -172,6 +175,12 @@ class DatabaseIntrospection(NonrelDatabaseIntrospection):
 class DatabaseWrapper(NonrelDatabaseWrapper):
     """
     Public API: connection, database, get_collection.
+
+    Wrappers connecting to the same server share a PyMongo client
+    (see pool.ClientPool), OPTIONS['MAX_POOL_SIZE'] bounds its
+    sockets. Unless OPTIONS['THREAD_REQUESTS'] is False, the thread
+    of the wrapper keeps a socket of the client until close(), which
+    Django calls at the end of each HTTP request.
     """
 
     def __init__(self, *args, **kwargs):
@@ -184,13 +193,37 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
         self.introspection = DatabaseIntrospection(self)
         self.validation = DatabaseValidation(self)
         self.connected = False
+        self.thread_requests = True
+        self.in_request = False
+        self._collections = {}
+        self._server_version = None
         del self.connection
 
+    @property
+    def server_version(self):
+        """
+        The version of the MongoDB server, as a tuple of ints.
+        """
+        if self._server_version is None:
+            self._server_version = tuple(
+                self.connection.server_info()['versionArray'][:3])
+        return self._server_version
+
     def get_collection(self, name, **kwargs):
         if (kwargs.pop('existing', False) and
                 name not in self.connection.database.collection_names()):
             return None
-        collection = self.collection_class(self.database, name, **kwargs)
+        if self.thread_requests and not self.in_request:
+            self.in_request = pool.start_request(self.connection)
+        if kwargs:
+            collection = self.collection_class(self.database, name, **kwargs)
+        else:
+            # The cache belongs to the wrapper of this alias, so it's
+            # keyed by the collection name alone.
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = \
+                    self.collection_class(self.database, name)
         if settings.DEBUG:
             collection = CollectionDebugWrapper(collection, self.alias)
         return collection
@@ -203,7 +236,7 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
         raise AttributeError(attr)
 
     def _connect(self):
-        settings = copy.deepcopy(self.settings_dict)
+        settings = dict(self.settings_dict)
 
         def pop(name, default=None):
             return settings.pop(name) or default
@@ -212,10 +245,10 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
         port = pop('PORT')
         user = pop('USER')
         password = pop('PASSWORD')
-        options = pop('OPTIONS', {})
+        options = dict(pop('OPTIONS', {}))
 
         self.operation_flags = options.pop('OPERATIONS', {})
-        if not any(k in ['save', 'delete', 'update']
+        if not any(k in ['save', 'delete', 'update', 'aggregate']
                    for k in self.operation_flags):
             # Flags apply to all operations.
             flags = self.operation_flags
@@ -223,18 +256,19 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
                                     'update': flags}
 
         # Lower-case all OPTIONS keys.
-        for key in options.iterkeys():
-            options[key.lower()] = options.pop(key)
+        options = dict((key.lower(), value)
+                       for key, value in options.iteritems())
+        self.thread_requests = options.pop('thread_requests', True)
 
         try:
-            self.connection = Connection(host=host, port=port, **options)
+            self.connection = pool.get_client(host, port, options, user)
             self.database = self.connection[db_name]
         except TypeError:
             exc_info = sys.exc_info()
             raise ImproperlyConfigured, exc_info[1], exc_info[2]
 
         if user and password:
-            if not self.database.authenticate(user, password):
+            if not pool.authenticate(self.database, user, password):
                 raise ImproperlyConfigured("Invalid username or password.")
 
         self.connected = True
@@ -242,8 +276,11 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
 
     def _reconnect(self):
         if self.connected:
+            self.close()
             del self.connection
             del self.database
+            self._collections.clear()
+            self._server_version = None
             self.connected = False
         self._connect()
 
@@ -254,4 +291,9 @@ class DatabaseWrapper(NonrelDatabaseWrapper):
         pass
 
     def close(self):
-        pass
+        """
+        Gives the socket of the thread back to the pool of the client.
+        """
+        if self.in_request:
+            pool.end_request(self.connection)
+            self.in_request = False
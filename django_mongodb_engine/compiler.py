@@ -5,7 +5,7 @@ import sys
 import django
 from django.db.models import F, NOT_PROVIDED
 from django.db.models.sql import aggregates as sqlaggregates
-from django.db.models.sql.constants import MULTI
+from django.db.models.sql.constants import LOOKUP_SEP, MULTI
 from django.db.models.sql.where import OR
 from django.db.utils import DatabaseError, IntegrityError
 from django.utils.encoding import smart_str
@@ -13,6 +13,12 @@ from django.utils.tree import Node
 
 from pymongo import ASCENDING, DESCENDING
 from pymongo.errors import PyMongoError, DuplicateKeyError
+try:
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    # PyMongo < 2.7, inserts fall back to Collection.save.
+    class BulkWriteError(PyMongoError):
+        pass
 
 from djangotoolbox.db.basecompiler import (
     NonrelQuery,
@@ -22,7 +28,7 @@ from djangotoolbox.db.basecompiler import (
     NonrelDeleteCompiler,
     EmptyResultSet)
 
-from .aggregations import get_aggregation_class_by_name
+from .aggregations import build_pipeline, get_aggregation_class_by_name
 from .query import A
 from .utils import safe_regex
 
@@ -77,6 +83,28 @@ NEGATED_OPERATORS_MAP = {
 }
 
 
+# Oldest server version running the aggregation pipelines.
+MIN_AGGREGATION_VERSION = (2, 6)
+
+# Name of the relevance of the results of text searches.
+TEXT_SCORE = '_text_score'
+
+# Server error codes of unique index violations.
+DUPLICATE_KEY_CODES = (11000, 11001, 12582)
+
+
+def get_write_concern(options):
+    """
+    Returns the write concern document of the write options of the
+    operation flags, None to use the one of the collection.
+    """
+    concern = dict((key, value) for key, value in options.iteritems()
+                   if key in ('w', 'j', 'fsync', 'wtimeout'))
+    if 'safe' in options and 'w' not in concern:
+        concern['w'] = 1 if options['safe'] else 0
+    return concern or None
+
+
 def safe_call(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -84,6 +112,11 @@ def safe_call(func):
             return func(*args, **kwargs)
         except DuplicateKeyError, e:
             raise IntegrityError, IntegrityError(smart_str(e)), sys.exc_info()[2]
+        except BulkWriteError, e:
+            errors = e.details.get('writeErrors', ())
+            if any(error.get('code') in DUPLICATE_KEY_CODES for error in errors):
+                raise IntegrityError, IntegrityError(smart_str(e)), sys.exc_info()[2]
+            raise DatabaseError, DatabaseError(smart_str(e)), sys.exc_info()[2]
         except PyMongoError, e:
             raise DatabaseError, DatabaseError(smart_str(e)), sys.exc_info()[2]
     return wrapper
@@ -136,16 +169,23 @@ class MongoQuery(NonrelQuery):
             return []
 
         fields = get_selected_fields(self.query)
+        ordering = self.ordering
+        if '$text' in self.mongo_query:
+            # Sort text searches by relevance unless ordered explicitly.
+            fields = dict((field, True) for field in fields or ())
+            fields[TEXT_SCORE] = {'$meta': 'textScore'}
+            if not ordering:
+                ordering = [(TEXT_SCORE, {'$meta': 'textScore'})]
         cursor = self.collection.find(self.mongo_query, fields=fields)
-        if self.ordering:
-            cursor.sort(self.ordering)
+        if ordering:
+            cursor.sort(ordering)
         if self.query.low_mark > 0:
             cursor.skip(self.query.low_mark)
         if self.query.high_mark is not None:
             cursor.limit(int(self.query.high_mark - self.query.low_mark))
         return cursor
 
-    def add_filters(self, filters, query=None):
+    def add_filters(self, filters, query=None, in_or=False):
         children = self._get_children(filters.children)
 
         if query is None:
@@ -172,7 +212,8 @@ class MongoQuery(NonrelQuery):
                 if filters.connector == OR and filters.negated:
                     raise NotImplementedError("Negated ORs are not supported.")
 
-                self.add_filters(child, query=subquery)
+                self.add_filters(child, query=subquery,
+                                 in_or=in_or or filters.connector == OR)
 
                 if filters.connector == OR and subquery:
                     or_conditions.extend(subquery.pop('$or', []))
@@ -183,6 +224,17 @@ class MongoQuery(NonrelQuery):
 
             field, lookup_type, value = self._decode_child(child)
 
+            if getattr(field, 'text_column', None):
+                # Text searches go to the top level of the query and
+                # use the text index of the collection, so no enclosing
+                # node may be an OR.
+                if (in_or or filters.connector == OR or self._negated or
+                        '$text' in self.mongo_query):
+                    raise DatabaseError("Text searches can't be negated, "
+                                        "ORed or combined.")
+                self.mongo_query['$text'] = value
+                continue
+
             if lookup_type in ('month', 'day'):
                 raise DatabaseError("MongoDB does not support month/day "
                                     "queries.")
@@ -295,15 +347,22 @@ class SQLCompiler(NonrelCompiler):
     def get_collection(self):
         return self.connection.get_collection(self.query.get_meta().db_table)
 
+    def results_iter(self):
+        """
+        Runs annotate() queries grouping by the selected fields as a
+        single aggregation pipeline.
+        """
+        if self.query.group_by is None or not self.query.aggregate_select:
+            return super(SQLCompiler, self).results_iter()
+        return self._group_results_iter()
+
     def execute_sql(self, result_type=MULTI):
         """
         Handles aggregate/count queries.
         """
-        collection = self.get_collection()
         aggregations = self.query.aggregate_select.items()
 
-        if len(aggregations) == 1 and isinstance(aggregations[0][1],
-                                                 sqlaggregates.Count):
+        if len(aggregations) == 1 and self._counts_all(aggregations[0][1]):
             # Ne need for full-featured aggregation processing if we
             # only want to count().
             if result_type is MULTI:
@@ -311,53 +370,156 @@ class SQLCompiler(NonrelCompiler):
             else:
                 return [self.get_count()]
 
-        counts, reduce, finalize, order, initial = [], [], [], [], {}
         try:
             query = self.build_query()
         except EmptyResultSet:
-            return []
-
-        for alias, aggregate in aggregations:
+            return None
+
+        aggregates = self._get_aggregates()
+        results = list(self._aggregate(build_pipeline(
+            query.mongo_query, (), aggregates)))
+        if not results:
+            return None
+        row = [results[0].get(aggregate.alias) for aggregate in aggregates]
+        if result_type is MULTI:
+            return [row]
+        return row
+
+    def _counts_all(self, aggregate):
+        opts = self.query.get_meta()
+        return isinstance(aggregate, sqlaggregates.Count) and \
+            aggregate.col in ('*', (opts.db_table, opts.pk.column))
+
+    def _get_aggregates(self):
+        """
+        Returns MongoAggregates for the aggregates of the query.
+        """
+        opts = self.query.get_meta()
+        aggregates = []
+        for alias, aggregate in self.query.aggregate_select.items():
             assert isinstance(aggregate, sqlaggregates.Aggregate)
-            if isinstance(aggregate, sqlaggregates.Count):
-                order.append(None)
-                # Needed to keep the iteration order which is important
-                # in the returned value.
-                # XXX: This actually does a separate query... performance?
-                counts.append(self.get_count())
-                continue
-
-            aggregate_class = get_aggregation_class_by_name(
-                aggregate.__class__.__name__)
             lookup = aggregate.col
             if isinstance(lookup, tuple):
                 # lookup is a (table_name, column_name) tuple.
                 # Get rid of the table name as aggregations can't span
                 # multiple tables anyway.
-                if lookup[0] != collection.name:
+                if lookup[0] != opts.db_table:
                     raise DatabaseError("Aggregations can not span multiple "
                                         "tables (tried %r and %r)." %
-                                        (lookup[0], collection.name))
+                                        (lookup[0], opts.db_table))
                 lookup = lookup[1]
-            self.query.aggregates[alias] = aggregate = aggregate_class(
-                alias, lookup, aggregate.source)
-            order.append(alias) # Just to keep the right order.
-            initial.update(aggregate.initial())
-            reduce.append(aggregate.reduce())
-            finalize.append(aggregate.finalize())
-
-        reduce = 'function(doc, out){ %s }' % '; '.join(reduce)
-        finalize = 'function(out){ %s }' % '; '.join(finalize)
-        cursor = collection.group(None, query.mongo_query, initial, reduce,
-                                  finalize)
-
-        ret = []
-        for alias in order:
-            result = cursor[0][alias] if alias else counts.pop(0)
-            if result_type is MULTI:
-                result = [result]
-            ret.append(result)
-        return ret
+                if lookup == opts.pk.column:
+                    lookup = '_id'
+            elif lookup == '*':
+                lookup = None
+            aggregate_class = get_aggregation_class_by_name(
+                aggregate.__class__.__name__)
+            aggregates.append(aggregate_class(
+                alias, lookup, aggregate.source,
+                distinct=bool(aggregate.extra.get('distinct'))))
+        return aggregates
+
+    def _get_group_ordering(self, aliases):
+        """
+        Returns (name, direction) tuples for the ordering of a grouped
+        query, names are document fields or aggregate aliases.
+        """
+        opts = self.query.get_meta()
+        if not self.query.default_ordering:
+            ordering = self.query.order_by
+        else:
+            ordering = self.query.order_by or opts.ordering
+
+        group_ordering = []
+        for order in ordering:
+            if LOOKUP_SEP in order or order == '?':
+                raise DatabaseError("Unsupported ordering of an aggregation "
+                                    "(%s)." % order)
+            ascending = not order.startswith('-')
+            if not self.query.standard_ordering:
+                ascending = not ascending
+            name = order.lstrip('+-')
+            if name not in aliases:
+                if name == 'pk':
+                    name = opts.pk.name
+                field = opts.get_field(name)
+                name = '_id' if field.primary_key else field.column
+            group_ordering.append((name, ASCENDING if ascending
+                                         else DESCENDING))
+        return group_ordering
+
+    def _group_results_iter(self):
+        fields = self.get_fields()
+        aggregates = self._get_aggregates()
+        ordering = self._get_group_ordering(
+            [aggregate.alias for aggregate in aggregates])
+
+        # The ordering goes to the pipeline, build the filters without
+        # it as the base compiler doesn't know the aggregate aliases.
+        order_by, default_ordering = (self.query.order_by,
+                                      self.query.default_ordering)
+        self.query.order_by, self.query.default_ordering = [], False
+        try:
+            query = self.build_query(fields)
+        except EmptyResultSet:
+            return
+        finally:
+            self.query.order_by, self.query.default_ordering = (
+                order_by, default_ordering)
+
+        pk_column = self.query.get_meta().pk.column
+        group_by = []
+        for field in fields:
+            column = '_id' if field.primary_key else field.column
+            if column not in group_by:
+                group_by.append(column)
+        for name, direction in ordering:
+            # Like SQL, also group by the fields ordered by.
+            if name not in group_by and \
+                    name not in self.query.aggregate_select:
+                group_by.append(name)
+
+        low_mark, high_mark = self.query.low_mark, self.query.high_mark
+        if high_mark is not None:
+            if high_mark <= low_mark:
+                return
+            high_mark -= low_mark
+        pipeline = build_pipeline(query.mongo_query, group_by, aggregates,
+                                  ordering, low_mark, high_mark)
+
+        make_result = self._get_result_maker(fields)
+        resolve_aggregate = self.query.resolve_aggregate
+        django_aggregates = self.query.aggregate_select.values()
+        for doc in self._aggregate(pipeline):
+            entity = doc['_id']
+            if '_id' in entity:
+                entity[pk_column] = entity.pop('_id')
+            yield make_result(entity) + [
+                resolve_aggregate(doc.get(aggregate.alias), django_aggregate,
+                                  self.connection)
+                for aggregate, django_aggregate
+                in zip(aggregates, django_aggregates)]
+
+    @safe_call
+    def _aggregate(self, pipeline):
+        """
+        Runs an aggregation pipeline, returning an iterable of results.
+        Large groupings may use temporary files on the server, unless
+        disabled by the 'aggregate' operation flags.
+
+        Pipelines use $size, $setDifference and allowDiskUse, so
+        aggregations need MongoDB 2.6 or later.
+        """
+        if self.connection.server_version < MIN_AGGREGATION_VERSION:
+            raise DatabaseError("Aggregations need MongoDB %s or later." %
+                                '.'.join(map(str, MIN_AGGREGATION_VERSION)))
+        options = dict({'allowDiskUse': True},
+                       **self.connection.operation_flags.get('aggregate', {}))
+        results = self.get_collection().aggregate(pipeline, **options)
+        if isinstance(results, dict):
+            # PyMongo 2 returns the command response.
+            return results['result']
+        return results
 
 
 class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
@@ -365,16 +527,27 @@ class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
     @safe_call
     def insert(self, docs, return_id=False):
         """
-        Stores a document using field columns as element names, except
+        Stores documents using field columns as element names, except
         for the primary key field for which "_id" is used.
 
         If just a {pk_field: None} mapping is given a new empty
         document is created, otherwise value for a primary key may not
         be None.
+
+        Documents are sent in bulk writes of at most
+        `max_insert_batch_size` documents: documents without an "_id"
+        are inserted, the others replace any stored document with the
+        same "_id", as `Collection.save` would. The 'save' operation
+        flags give the write concern, with 'ordered': False the server
+        goes on with the rest of a batch after a failing document.
         """
+        collection = self.get_collection()
+        options = dict(self.connection.operation_flags.get('save', {}))
+        pk_column = self.query.get_meta().pk.column
+
         for doc in docs:
             try:
-                doc['_id'] = doc.pop(self.query.get_meta().pk.column)
+                doc['_id'] = doc.pop(pk_column)
             except KeyError:
                 pass
             if doc.get('_id', NOT_PROVIDED) is None:
@@ -384,13 +557,34 @@ class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
                 else:
                     raise DatabaseError("Can't save entity with _id set to None")
 
-        collection = self.get_collection()
-        options = self.connection.operation_flags.get('save', {})
-
+        ordered = options.pop('ordered', True)
+        if not hasattr(collection, 'initialize_ordered_bulk_op'):
+            ids = [collection.save(doc, **options) for doc in docs]
+        else:
+            write_concern = get_write_concern(options)
+            batch_size = self.connection.ops.max_insert_batch_size
+            for start in range(0, len(docs), batch_size):
+                self._bulk_insert(collection, docs[start:start + batch_size],
+                                  ordered, write_concern)
+            ids = [doc['_id'] for doc in docs]
+
+        if len(ids) > 1:
+            return ids
         if return_id:
-            return collection.save(doc, **options)
+            return ids[0]
+
+    def _bulk_insert(self, collection, docs, ordered, write_concern):
+        if ordered:
+            bulk = collection.initialize_ordered_bulk_op()
         else:
-            collection.save(doc, **options)
+            bulk = collection.initialize_unordered_bulk_op()
+        for doc in docs:
+            if '_id' in doc:
+                bulk.find({'_id': doc['_id']}).upsert().replace_one(doc)
+            else:
+                # Sets the generated ObjectId as the "_id" of doc.
+                bulk.insert(doc)
+        bulk.execute(write_concern)
 
 
 # TODO: Define a common nonrel API for updates and add it to the nonrel
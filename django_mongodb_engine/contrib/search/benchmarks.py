@@ -0,0 +1,104 @@
+"""
+Benchmarks the array and the text index modes of TokenizedField:
+indexing throughput and search latency on a corpus built from the
+posts of the blog fixtures.
+
+Run with settings whose default database is MongoDB (2.6 or later),
+e.g.:
+    DJANGO_SETTINGS_MODULE=settings \
+        python -m django_mongodb_engine.contrib.search.benchmarks
+"""
+import json
+import os
+import time
+from timeit import Timer
+
+from django.db import connections, models
+
+from .fields import TokenizedField
+
+
+FIXTURES = [os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                         os.pardir, 'blog', 'fixtures', name)
+            for name in ('deployed.json', 'test.json')]
+
+
+class ArrayPost(models.Model):
+    content = TokenizedField(max_length=10000)
+
+    class Meta:
+        app_label = 'search_benchmarks'
+
+
+class TextIndexPost(models.Model):
+    content = TokenizedField(max_length=10000, text_index=True)
+
+    class Meta:
+        app_label = 'search_benchmarks'
+
+
+def get_corpus(size):
+    """Returns size texts made of the titles and texts of the posts of
+    the fixtures, each one a different combination of them."""
+    posts = []
+    for path in FIXTURES:
+        with open(path) as fixture:
+            posts.extend(u'%s. %s' % (obj['fields']['title'],
+                                      obj['fields']['text'])
+                         for obj in json.load(fixture)
+                         if obj['model'] == 'blog.post')
+    return [u' '.join(posts[(index + offset) % len(posts)]
+                      for offset in range(index % len(posts) + 1))
+            for index in range(size)]
+
+def get_searches(corpus, number):
+    """Returns single words and two word phrases of the corpus."""
+    words = sorted(set(word for text in corpus[:10]
+                       for word in ArrayPost._meta.get_field(
+                           'content_tokenized')._tokenizer.tokenize(text)
+                       if len(word) > 3))
+    searches = words[:number // 2]
+    searches += [u'%s %s' % pair for pair in zip(words[1::2], words[::2])]
+    return searches[:number]
+
+def reset(model):
+    connection = connections[model.objects.db]
+    connection.get_collection(model._meta.db_table).drop()
+    connection.creation.sql_indexes_for_model(model, None)
+
+def index(model, corpus):
+    reset(model)
+    start = time.time()
+    for text in corpus:
+        model.objects.create(content=text)
+    return len(corpus) / (time.time() - start)
+
+def search(model, searches, number):
+    timer = Timer(lambda: [list(model.objects.filter(
+        content_tokenized=value)[:20]) for value in searches])
+    best = min(timer.repeat(repeat=3, number=number))
+    return best / number / len(searches) * 1000
+
+def benchmark(size=1000, searches=20, number=5):
+    corpus = get_corpus(size)
+    values = get_searches(corpus, searches)
+    results = []
+    try:
+        for name, model in (('array', ArrayPost), ('text', TextIndexPost)):
+            results.append((name, index(model, corpus),
+                            search(model, values, number)))
+    finally:
+        for model in (ArrayPost, TextIndexPost):
+            connections[model.objects.db].get_collection(
+                model._meta.db_table).drop()
+    return len(corpus), len(values), results
+
+def main():
+    count, searches, results = benchmark()
+    print 'Indexing %d posts, %d searches:' % (count, searches)
+    print '  %-10s %12s %12s' % ('mode', 'posts/s', 'ms/search')
+    for name, throughput, latency in results:
+        print '  %-10s %12.1f %12.3f' % (name, throughput, latency)
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.utils import DatabaseError
 
 from .tokenizer import BaseTokenizer
 
@@ -7,12 +8,27 @@ __all__ = ['TokenizedField']
 
 
 class TokenizedField(models.Field):
+    """
+    Adds a searchable CharField named like the field, the field itself
+    is named '<name>_tokenized' and is used for lookups.
+
+    By default the tokens of the text are stored in an array and
+    searched with $all. With text_index=True nothing is stored, the
+    text is indexed by a MongoDB text index (created by syncdb) and
+    'exact' and 'iexact' lookups become $text searches for the whole
+    phrase, other lookups aren't supported. Results of text searches
+    without an explicit ordering are sorted by relevance.
+    """
 
     def __init__(self, *args, **kwargs):
-        super(TokenizedField, self).__init__(*args, **kwargs)
         as_textfield = kwargs.pop('as_textfield', False)
         self._tokenizer = kwargs.pop('tokenizer', BaseTokenizer)()
+        self.text_index = kwargs.pop('text_index', False)
+        super(TokenizedField, self).__init__(*args, **kwargs)
         self.parent_field = models.CharField(*args, **kwargs)
+        if self.text_index:
+            # Nothing is stored for this field in text index mode.
+            self.null = True
 
     def contribute_to_class(self, cls, name):
         super(TokenizedField, self).contribute_to_class(
@@ -20,6 +36,15 @@ class TokenizedField(models.Field):
         setattr(self, 'parent_field_name', name)
         cls.add_to_class(name, self.parent_field)
 
+    @property
+    def text_column(self):
+        """
+        The column indexed by the text index, None in array mode.
+        """
+        if self.text_index:
+            return self.parent_field.column
+        return None
+
     def get_db_prep_lookup(self, lookup_type, value, connection,
                            prepared=False):
         # If for some reason value is being converted to list by some
@@ -28,6 +53,14 @@ class TokenizedField(models.Field):
         if isinstance(value, list):
             value = ''.join(value)
 
+        if self.text_index:
+            # Other lookups would mangle the $text document when their
+            # values get normalized.
+            if lookup_type not in ('exact', 'iexact'):
+                raise DatabaseError("Text searches only support exact "
+                                    "lookups, got %r." % lookup_type)
+            return {'$search': '"%s"' % value.replace('"', ' ')}
+
         # When 'exact' is used we'll perform an exact_phrase query
         # using the $all operator otherwhise we'll just tokenized
         # the value. Djangotoolbox will do the remaining checks.
@@ -36,5 +69,7 @@ class TokenizedField(models.Field):
         return self._tokenizer.tokenize(value)
 
     def pre_save(self, model_instance, add):
+        if self.text_index:
+            return None
         return self._tokenizer.tokenize(getattr(model_instance,
                                                 self.parent_field_name))
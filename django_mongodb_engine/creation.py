@@ -1,6 +1,11 @@
 from django.db.utils import DatabaseError
 
 from pymongo import DESCENDING
+try:
+    from pymongo import TEXT
+except ImportError:
+    # PyMongo < 2.7.1
+    TEXT = 'text'
 
 from djangotoolbox.db.creation import NonrelDatabaseCreation
 
@@ -47,6 +52,15 @@ class DatabaseCreation(NonrelDatabaseCreation):
             self._handle_newstyle_indexes(ensure_index, meta, newstyle_indexes)
         else:
             self._handle_oldstyle_indexes(ensure_index, meta)
+        self._handle_text_indexes(ensure_index, meta)
+
+    def _handle_text_indexes(self, ensure_index, meta):
+        # A collection has at most one text index, it covers the
+        # columns of all the fields searched with $text.
+        columns = [field.text_column for field in meta.local_fields
+                   if getattr(field, 'text_column', None)]
+        if columns:
+            ensure_index([(column, TEXT) for column in columns])
 
     def _handle_newstyle_indexes(self, ensure_index, meta, indexes):
         from djangotoolbox.fields import AbstractIterableField, \
@@ -0,0 +1,48 @@
+import json
+import time
+
+from django.conf import settings
+
+from .router import get_recent_writes, set_recent_writes
+
+
+WRITES_COOKIE_NAME = getattr(settings, 'MONGODB_WRITES_COOKIE_NAME',
+                             'mongodb_writes')
+
+
+class RecentWritesMiddleware(object):
+    """
+    Carries the writes recorded by MongoDBRouter over to the next
+    requests of the same client in a cookie, so a GET following a POST
+    (e.g. after a redirect) reads the written models from the primary
+    even when served by another thread or process.
+
+    Writes are kept for the longest of the MONGODB_READ_YOUR_WRITES_SECONDS
+    windows. A forged cookie can only move reads to the primary.
+    """
+
+    def get_max_age(self):
+        windows = getattr(settings, 'MONGODB_READ_YOUR_WRITES_SECONDS', {})
+        return max(windows.values() or [0])
+
+    def process_request(self, request):
+        try:
+            writes = json.loads(request.COOKIES.get(WRITES_COOKIE_NAME, '{}'))
+            writes = dict((str(table), float(written))
+                          for table, written in writes.iteritems())
+        except (ValueError, TypeError, AttributeError):
+            writes = {}
+        set_recent_writes(writes)
+
+    def process_response(self, request, response):
+        max_age = self.get_max_age()
+        now = time.time()
+        writes = dict((table, written)
+                      for table, written in get_recent_writes().iteritems()
+                      if now - written < max_age)
+        if writes:
+            response.set_cookie(WRITES_COOKIE_NAME, json.dumps(writes),
+                                max_age=int(max_age) + 1)
+        elif WRITES_COOKIE_NAME in request.COOKIES:
+            response.delete_cookie(WRITES_COOKIE_NAME)
+        return response
@@ -0,0 +1,92 @@
+import threading
+
+from pymongo.connection import Connection
+
+
+class ClientPool(object):
+    """
+    Process-wide registry of PyMongo clients, shared by the
+    DatabaseWrappers of all threads that connect to the same server
+    with the same options.
+
+    Every client keeps its own pool of sockets (of at most the
+    'max_pool_size' option); a thread using a client in a request
+    always gets the same socket, so it reads its own writes.
+    """
+
+    def __init__(self, client_class=Connection):
+        self.client_class = client_class
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.authenticated = set()
+        self.metrics = dict.fromkeys(
+            ['client_lookups', 'clients', 'requests', 'active_requests'], 0)
+
+    def get_client(self, host, port, options, user=None):
+        """
+        Returns the client for the given server, (lower-cased) options
+        and user, creating it on the first lookup.
+        """
+        key = (host, port, user, repr(sorted(options.iteritems())))
+        with self.lock:
+            self.metrics['client_lookups'] += 1
+            client = self.clients.get(key)
+            if client is None:
+                client = self.client_class(host=host, port=port, **options)
+                self.clients[key] = client
+                self.metrics['clients'] += 1
+        return client
+
+    def authenticate(self, database, user, password):
+        """
+        Authenticates the client of the database once per user, the
+        client reuses the credentials for all its sockets.
+        """
+        key = (id(database.connection), database.name, user, password)
+        if key in self.authenticated:
+            return True
+        if not database.authenticate(user, password):
+            return False
+        with self.lock:
+            self.authenticated.add(key)
+        return True
+
+    def start_request(self, client):
+        """
+        Binds a socket of the client to the current thread until
+        end_request is called. Returns False for clients without
+        requests (PyMongo 3).
+        """
+        if not hasattr(client, 'start_request'):
+            return False
+        client.start_request()
+        with self.lock:
+            self.metrics['requests'] += 1
+            self.metrics['active_requests'] += 1
+        return True
+
+    def end_request(self, client):
+        """
+        Returns the socket of the current thread to the client's pool.
+        """
+        client.end_request()
+        with self.lock:
+            self.metrics['active_requests'] -= 1
+
+    def get_metrics(self):
+        with self.lock:
+            return dict(self.metrics)
+
+    def clear(self):
+        """
+        Disconnects and forgets all the clients.
+        """
+        with self.lock:
+            clients = self.clients.values()
+            self.clients.clear()
+            self.authenticated.clear()
+        for client in clients:
+            client.disconnect()
+
+
+pool = ClientPool()
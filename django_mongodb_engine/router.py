@@ -1,14 +1,26 @@
+from contextlib import contextmanager
+import random
+import threading
+import time
+
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_started
 
 
 _mongodbs = []
+_secondaries = {}
+_state = threading.local()
 
 def _init_mongodbs():
+    del _mongodbs[:]
+    _secondaries.clear()
     for name, options in settings.DATABASES.iteritems():
         if options['ENGINE'] != 'django_mongodb_engine':
             continue
-        if options.get('IS_DEFAULT'):
+        if options.get('SECONDARY_OF'):
+            _secondaries.setdefault(options['SECONDARY_OF'], []).append(name)
+        elif options.get('IS_DEFAULT'):
             _mongodbs.insert(0, name)
         else:
             _mongodbs.append(name)
@@ -16,6 +28,49 @@ def _init_mongodbs():
     if not _mongodbs:
         raise ImproperlyConfigured("No MongoDB database found in "
                                    "settings.DATABASES.")
+    for primary in _secondaries:
+        if primary not in _mongodbs:
+            raise ImproperlyConfigured("SECONDARY_OF must name a MongoDB "
+                                       "database, got %r." % primary)
+
+
+@contextmanager
+def use_primary():
+    """
+    Routes the reads of the current thread to the primary database
+    within the block, e.g. for requests that must read their writes.
+    """
+    depth = getattr(_state, 'use_primary', 0)
+    _state.use_primary = depth + 1
+    try:
+        yield
+    finally:
+        _state.use_primary = depth
+
+
+def get_recent_writes():
+    """
+    Returns the {db_table: timestamp} writes recorded by MongoDBRouter
+    for the current request.
+    """
+    return dict(getattr(_state, 'writes', {}))
+
+def set_recent_writes(writes):
+    """
+    Replaces the writes recorded for the current request, e.g. with the
+    ones of earlier requests of the same client (see
+    middleware.RecentWritesMiddleware).
+    """
+    _state.writes = dict(writes)
+
+def reset_state(**kwargs):
+    """
+    Forgets the writes and use_primary() blocks of the current thread,
+    so they don't leak into the next request it serves.
+    """
+    _state.writes = {}
+    _state.use_primary = 0
+request_started.connect(reset_state)
 
 
 class MongoDBRouter(object):
@@ -25,6 +80,16 @@ class MongoDBRouter(object):
     MongoDBRouter uses the MONGODB_MANAGED_APPS and MONGODB_MANAGED_MODELS
     settings to know which models/apps should be stored inside MongoDB.
 
+    Reads of the models listed in MONGODB_READ_YOUR_WRITES_SECONDS may go
+    to a MongoDB database declaring 'SECONDARY_OF': <primary alias> in
+    settings.DATABASES, e.g. one whose OPTIONS have a secondary
+    READ_PREFERENCE or point to a secondary. The setting maps app labels
+    and 'app_label.ModelName' names to the number of seconds reads of
+    the model stay on the primary after the client wrote it. Writes are
+    recorded per request, and across requests by
+    middleware.RecentWritesMiddleware; reads inside use_primary() also
+    stay on the primary. Writes always go to the primary.
+
     See: http://docs.djangoproject.com/en/dev/topics/db/multi-db/#topics-db-multi-db-routing
     """
 
@@ -34,6 +99,8 @@ class MongoDBRouter(object):
         self.managed_apps = [app.split('.')[-1] for app in
                              getattr(settings, 'MONGODB_MANAGED_APPS', [])]
         self.managed_models = getattr(settings, 'MONGODB_MANAGED_MODELS', [])
+        self.write_windows = getattr(settings,
+                                     'MONGODB_READ_YOUR_WRITES_SECONDS', {})
 
     def is_managed(self, model):
         """
@@ -45,14 +112,53 @@ class MongoDBRouter(object):
         full_name = '%s.%s' % (model._meta.app_label, model._meta.object_name)
         return full_name in self.managed_models
 
+    def get_write_window(self, model):
+        """
+        Returns the number of seconds reads of the model stay on the
+        primary after a write, None if it's always read from the primary.
+        """
+        full_name = '%s.%s' % (model._meta.app_label, model._meta.object_name)
+        window = self.write_windows.get(full_name)
+        if window is None:
+            window = self.write_windows.get(model._meta.app_label)
+        return window
+
     def db_for_read(self, model, **hints):
         """
-        Points all operations on MongoDB models to a MongoDB database.
+        Points reads of MongoDB models to a secondary of the MongoDB
+        database unless the model was written recently, to the database
+        itself otherwise.
         """
-        if self.is_managed(model):
-            return _mongodbs[0]
+        if not self.is_managed(model):
+            return None
+        primary = _mongodbs[0]
+        secondaries = _secondaries.get(primary)
+        if not secondaries or getattr(_state, 'use_primary', 0):
+            return primary
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == primary:
+            # Keep following relations of instances read from the primary
+            # there.
+            return primary
+        window = self.get_write_window(model)
+        if window is None:
+            return primary
+        written = getattr(_state, 'writes', {}).get(model._meta.db_table)
+        if written is not None and time.time() - written < window:
+            return primary
+        return random.choice(secondaries)
 
-    db_for_write = db_for_read # Same algorithm.
+    def db_for_write(self, model, **hints):
+        """
+        Points all writes of MongoDB models to a MongoDB database and
+        records the time of the write for db_for_read.
+        """
+        if not self.is_managed(model):
+            return None
+        if not hasattr(_state, 'writes'):
+            _state.writes = {}
+        _state.writes[model._meta.db_table] = time.time()
+        return _mongodbs[0]
 
     def allow_relation(self, obj1, obj2, **hints):
         """
@@ -62,8 +168,11 @@ class MongoDBRouter(object):
 
     def allow_syncdb(self, db, model):
         """
-        Makes sure that MongoDB models only appear on MongoDB databases.
+        Makes sure that MongoDB models only appear on MongoDB databases,
+        and nothing is synced to their secondaries.
         """
+        if any(db in secondaries for secondaries in _secondaries.itervalues()):
+            return False
         if db in _mongodbs:
             return self.is_managed(model)
         elif self.is_managed(model):
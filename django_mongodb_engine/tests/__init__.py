@@ -0,0 +1,2 @@
+from .aggregations import AggregationTest
+from .router import RouterTest
@@ -0,0 +1,36 @@
+from django.db.models import Avg, Count, Max
+from django.test import TestCase
+
+from .testmodels import Person
+
+
+class AggregationTest(TestCase):
+    people = [('alice', 'Berlin', 30), ('bob', 'Berlin', 40),
+              ('carol', 'Berlin', None), ('dave', 'Madrid', 20),
+              ('eve', 'Madrid', 40), ('frank', 'Oslo', 60)]
+
+    def setUp(self):
+        for name, city, age in self.people:
+            Person.objects.create(name=name, city=city, age=age)
+
+    def test_aggregate(self):
+        self.assertEqual(Person.objects.aggregate(Max('age'), Count('age')),
+                         {'age__max': 60, 'age__count': 5})
+
+    def test_order_by_aggregate_alias(self):
+        self.assertEqual(
+            list(Person.objects.values('city').annotate(
+                n=Count('name')).order_by('-n')),
+            [{'city': 'Berlin', 'n': 3}, {'city': 'Madrid', 'n': 2},
+             {'city': 'Oslo', 'n': 1}])
+        self.assertEqual(
+            [row['city'] for row in Person.objects.values('city').annotate(
+                age=Avg('age')).order_by('age')],
+            ['Madrid', 'Berlin', 'Oslo'])
+
+    def test_order_by_group_field(self):
+        self.assertEqual(
+            list(Person.objects.filter(age__gte=30).values('city').annotate(
+                n=Count('age')).order_by('-city')),
+            [{'city': 'Oslo', 'n': 1}, {'city': 'Madrid', 'n': 1},
+             {'city': 'Berlin', 'n': 2}])
@@ -0,0 +1,108 @@
+import time
+
+from django.core.signals import request_started
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from .. import router
+from ..middleware import RecentWritesMiddleware, WRITES_COOKIE_NAME
+from ..router import MongoDBRouter, set_recent_writes, use_primary
+from .testmodels import Person
+
+
+DATABASES = {
+    'default': {'ENGINE': 'django_mongodb_engine', 'NAME': 'test'},
+    'secondary': {'ENGINE': 'django_mongodb_engine', 'NAME': 'test',
+                  'SECONDARY_OF': 'default'},
+    'other': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+class TestModel(object):
+    class _meta:
+        app_label = 'other'
+        object_name = 'TestModel'
+        db_table = 'other_testmodel'
+
+
+class RouterTest(SimpleTestCase):
+
+    def setUp(self):
+        self.settings_override = override_settings(
+            DATABASES=DATABASES, MONGODB_MANAGED_APPS=['tests'],
+            MONGODB_READ_YOUR_WRITES_SECONDS={'tests.Person': 10})
+        self.settings_override.enable()
+        self.mongodbs = list(router._mongodbs)
+        self.secondaries = dict(router._secondaries)
+        router._init_mongodbs()
+        request_started.send(sender=self.__class__)
+        self.router = MongoDBRouter()
+
+    def tearDown(self):
+        router._mongodbs[:] = self.mongodbs
+        router._secondaries.clear()
+        router._secondaries.update(self.secondaries)
+        request_started.send(sender=self.__class__)
+        self.settings_override.disable()
+
+    def test_routing(self):
+        self.assertEqual(self.router.db_for_read(Person), 'secondary')
+        self.assertEqual(self.router.db_for_read(TestModel), None)
+        self.assertEqual(self.router.db_for_write(Person), 'default')
+        self.assertEqual(self.router.db_for_write(TestModel), None)
+
+    def test_unlisted_models_read_from_primary(self):
+        with override_settings(MONGODB_READ_YOUR_WRITES_SECONDS={}):
+            self.assertEqual(MongoDBRouter().db_for_read(Person), 'default')
+
+    def test_read_your_writes(self):
+        self.router.db_for_write(Person)
+        self.assertEqual(self.router.db_for_read(Person), 'default')
+        set_recent_writes({Person._meta.db_table: time.time() - 11})
+        self.assertEqual(self.router.db_for_read(Person), 'secondary')
+
+    def test_writes_are_forgotten_between_requests(self):
+        self.router.db_for_write(Person)
+        request_started.send(sender=self.__class__)
+        self.assertEqual(self.router.db_for_read(Person), 'secondary')
+
+    def test_use_primary(self):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Person), 'default')
+        self.assertEqual(self.router.db_for_read(Person), 'secondary')
+
+    def test_instance_hint(self):
+        person = Person()
+        person._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(Person, instance=person),
+                         'default')
+
+    def test_writes_cookie(self):
+        middleware = RecentWritesMiddleware()
+        factory = RequestFactory()
+        request = factory.post('/')
+        middleware.process_request(request)
+        self.router.db_for_write(Person)
+        response = middleware.process_response(request, HttpResponse())
+        cookie = response.cookies[WRITES_COOKIE_NAME].value
+
+        # The redirected GET, maybe served by another thread.
+        request_started.send(sender=self.__class__)
+        request = factory.get('/')
+        request.COOKIES[WRITES_COOKIE_NAME] = cookie
+        middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(Person), 'default')
+
+        request_started.send(sender=self.__class__)
+        request = factory.get('/')
+        request.COOKIES[WRITES_COOKIE_NAME] = 'garbage'
+        middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(Person), 'secondary')
+
+    def test_allow_syncdb(self):
+        self.assertTrue(self.router.allow_syncdb('default', Person))
+        self.assertFalse(self.router.allow_syncdb('secondary', Person))
+        self.assertFalse(self.router.allow_syncdb('other', Person))
+        self.assertEqual(self.router.allow_syncdb('other', TestModel), None)
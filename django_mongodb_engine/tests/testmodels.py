@@ -0,0 +1,7 @@
+from django.db import models
+
+
+class Person(models.Model):
+    name = models.CharField(max_length=100)
+    city = models.CharField(max_length=100)
+    age = models.IntegerField(null=True)
@@ -89,6 +89,7 @@ class CollectionDebugWrapper(object):
     update = logging_wrapper('update')
     map_reduce = logging_wrapper('map_reduce')
     inline_map_reduce = logging_wrapper('inline_map_reduce')
+    aggregate = logging_wrapper('aggregate')
 
     del logging_wrapper
 
@@ -93,6 +93,9 @@ class DatabaseFeatures(NonrelDatabaseFeatures):
 class DatabaseOperations(NonrelDatabaseOperations):
     compiler_module = __name__.rsplit('.', 1)[0] + '.compiler'
 
+    # Maximum number of entities in a batch Put.
+    max_insert_batch_size = 500
+
     # Date used to store times as datetimes.
     # TODO: Use just date()?
     DEFAULT_DATE = datetime.date(1970, 1, 1)
@@ -1,4 +1,6 @@
+import datetime
 from functools import wraps
+from itertools import islice
 import sys
 
 from django.db.models.fields import AutoField
@@ -8,13 +10,14 @@ from django.db.models.sql.where import AND, OR
 from django.db.utils import DatabaseError, IntegrityError
 from django.utils.tree import Node
 
-from google.appengine.api.datastore import Entity, Query, MultiQuery, \
-    Put, Get, Delete
+from google.appengine.api.datastore import Entity, Query, Put, Get, \
+    GetAsync, Delete
 from google.appengine.api.datastore_errors import Error as GAEError
 from google.appengine.api.datastore_types import Key, Text
-from google.appengine.datastore.datastore_query import Cursor
+from google.appengine.datastore.datastore_query import Cursor, QueryOptions
 
 from djangotoolbox.db.basecompiler import (
+    NonrelResult,
     NonrelQuery,
     NonrelCompiler,
     NonrelInsertCompiler,
@@ -23,6 +26,7 @@ from djangotoolbox.db.basecompiler import (
 
 from .db_settings import get_model_indexes
 from .expressions import ExpressionEvaluator
+from .multiquery import MergedQuery, get_key
 from .utils import commit_locked
 
 
@@ -56,6 +60,19 @@ NEGATION_MAP = {
 # it from the lack of value.
 NOT_PROVIDED = object()
 
+# Field db_types that can be read back from the indexes by projection
+# queries (texts, blobs and lists are not indexed or give a result per
+# list item).
+PROJECTION_DB_TYPES = ('key', 'string', 'integer', 'long', 'float', 'bool',
+                       'decimal', 'datetime', 'date', 'time')
+
+# Projected datetimes may be returned as their index value, the number
+# of microseconds since the epoch.
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Offset used to count without a limit, as done by Query.Count.
+MAX_COUNT_OFFSET = 2 ** 31 - 1
+
 
 def safe_call(func):
     """
@@ -90,11 +107,13 @@ class GAEQuery(NonrelQuery):
         self.ordering = []
         self.db_table = self.query.get_meta().db_table
         self.pks_only = (len(fields) == 1 and fields[0].primary_key)
-        start_cursor = getattr(self.query, '_gae_start_cursor', None)
-        end_cursor = getattr(self.query, '_gae_end_cursor', None)
+        self.start_cursor = getattr(self.query, '_gae_start_cursor', None)
+        self.end_cursor = getattr(self.query, '_gae_end_cursor', None)
         self.config = getattr(self.query, '_gae_config', {})
-        self.gae_query = [Query(self.db_table, keys_only=self.pks_only,
-                                cursor=start_cursor, end_cursor=end_cursor)]
+        self.projection = self._get_projection(fields)
+        self.projected = False
+        self.projected_datetimes = ()
+        self.gae_query = [self._make_query()]
 
     # This is needed for debugging.
     def __repr__(self):
@@ -102,51 +121,34 @@ class GAEQuery(NonrelQuery):
 
     @safe_call
     def fetch(self, low_mark=0, high_mark=None):
-        query = self._build_query()
-        executed = False
-        if self.excluded_pks and high_mark is not None:
-            high_mark += len(self.excluded_pks)
-        if self.included_pks is not None:
-            results = self.get_matching_pk(low_mark, high_mark)
-        else:
-            if high_mark is None or high_mark > low_mark:
-                kw = {}
-                if self.config:
-                    kw.update(self.config)
-
-                if low_mark:
-                    kw['offset'] = low_mark
-                else:
-                    low_mark = 0
-
-                if high_mark:
-                    kw['limit'] = high_mark - low_mark
+        results = self._run(low_mark, high_mark)
+        if isinstance(results, NonrelResult):
+            results = results.get_result()
+        for entity in self._skip_excluded(results, low_mark, high_mark):
+            yield self._make_entity(entity)
 
-                results = query.Run(**kw)
-                executed = True
-            else:
-                results = ()
+    @safe_call
+    def fetch_async(self, low_mark=0, high_mark=None):
+        # Run and GetAsync send the first RPC right away, only
+        # iterating over the results waits for it.
+        results = self._run(low_mark, high_mark)
+        if isinstance(results, NonrelResult):
+            get_results = results.get_result
+        else:
+            get_results = lambda: results
 
-        if executed and not isinstance(query, MultiQuery):
-            def get_cursor():
-                return query.GetCursor()
-            self.query._gae_cursor = get_cursor
-
-        for entity in results:
-            if isinstance(entity, Key):
-                key = entity
-            else:
-                key = entity.key()
-            if key in self.excluded_pks:
-                continue
-            yield self._make_entity(entity)
+        @safe_call
+        def resolve():
+            return [self._make_entity(entity) for entity in
+                    self._skip_excluded(get_results(), low_mark, high_mark)]
+        return NonrelResult(resolve)
 
     @safe_call
     def count(self, limit=NOT_PROVIDED):
         if self.included_pks is not None:
             return len(self.get_matching_pk(0, limit))
-        if self.excluded_pks:
-            return len(list(self.fetch(0, 2000)))
+        if self.excluded_pks or len(self.gae_query) > 1:
+            return self._count_keys(limit).get_result()
         # The datastore's Count() method has a 'limit' kwarg, which has
         # a default value (obviously).  This value can be overridden to
         # anything you like, and importantly can be overridden to
@@ -158,6 +160,30 @@ class GAEQuery(NonrelQuery):
             kw['limit'] = limit
         return self._build_query().Count(**kw)
 
+    @safe_call
+    def count_async(self, limit=NOT_PROVIDED):
+        if self.included_pks is not None:
+            results = self.get_matching_pk_async(0, limit)
+            return NonrelResult(lambda: len(results.get_result()))
+        if self.excluded_pks or len(self.gae_query) > 1:
+            return self._count_keys(limit)
+        query = self._build_query()
+        # Same as Query.Count: skip over the results without returning
+        # them, the number of skipped results is the count.
+        if limit is NOT_PROVIDED:
+            limit = 1000
+        if limit is None:
+            offset = MAX_COUNT_OFFSET
+        else:
+            offset = min(limit, MAX_COUNT_OFFSET)
+        batcher = query.GetBatcher(
+            config=QueryOptions(limit=0, offset=offset, **(self.config or {})))
+
+        @safe_call
+        def resolve():
+            return max(0, batcher.next().skipped_results)
+        return NonrelResult(resolve)
+
     @safe_call
     def delete(self):
         if self.included_pks is not None:
@@ -297,34 +323,199 @@ class GAEQuery(NonrelQuery):
         combined = []
         for query in gae_query:
             for op, value in op_values:
-                self.gae_query = [Query(self.db_table,
-                                        keys_only=self.pks_only)]
-                self.gae_query[0].update(query)
+                # Keep the cursors, a single value __in filter still
+                # results in a single cursor-able query.
+                self.gae_query = [self._make_query(query)]
                 self._add_filter(field, op, value)
                 combined.append(self.gae_query[0])
         self.gae_query = combined
 
+    def _make_query(self, filters=None, projection=None, keys_only=None):
+        if keys_only is None:
+            keys_only = self.pks_only
+        query = Query(self.db_table, keys_only=keys_only,
+                      projection=projection, cursor=self.start_cursor,
+                      end_cursor=self.end_cursor)
+        if filters:
+            query.update(filters)
+        return query
+
+    def _get_projection(self, fields):
+        """
+        Returns the columns to fetch with a projection query when only
+        some indexed fields are selected (by values() or only()), or
+        None if whole entities should be fetched.
+        """
+        opts = self.query.get_meta()
+        if self.pks_only or len(fields) >= len(opts.fields):
+            return None
+        unindexed = get_model_indexes(self.query.model)['unindexed']
+        projection = []
+        for field in fields:
+            if field.primary_key:
+                continue
+            db_type = self.connection.creation.db_type(field)
+            if field.attname in unindexed or \
+                    db_type not in PROJECTION_DB_TYPES:
+                return None
+            projection.append(field.column)
+        return tuple(projection) or None
+
     def _make_entity(self, entity):
         if isinstance(entity, Key):
             key = entity
             entity = {}
         else:
             key = entity.key()
+            if self.projection:
+                for column in self.projection:
+                    value = entity.get(column)
+                    if isinstance(value, (int, long)) and \
+                            column in self.projected_datetimes:
+                        entity[column] = EPOCH + datetime.timedelta(
+                            microseconds=value)
 
         entity[self.query.get_meta().pk.column] = key
         return entity
 
+    def _project(self):
+        """
+        Rebuilds the queries as projection queries if only indexed
+        fields are fetched, once all filters are known.
+        """
+        self.projected = True
+        if self.included_pks is not None:
+            self.projection = None
+            return
+        projection = self.projection
+        keys_only = self.pks_only
+
+        # Merging sub-queries needs the values of the ordering
+        # properties, project them too rather than fetching entities.
+        sort_columns = ()
+        if len(self.gae_query) > 1 and (projection or keys_only):
+            sort_columns = tuple(column for column, _ in self.ordering
+                                 if column != '__key__' and
+                                     column not in (projection or ()))
+        if sort_columns:
+            projection = (projection or ()) + sort_columns
+            keys_only = False
+
+        # Properties with equality filters can't be projected.
+        filtered = set(key.split(' ', 1)[0] for query in self.gae_query
+                       for key in query if key.endswith(' ='))
+        if projection and filtered.intersection(projection):
+            projection = None
+
+        self.projection = projection
+        if projection is None and keys_only == self.pks_only:
+            return
+        opts = self.query.get_meta()
+        self.projected_datetimes = set(
+            field.column for field in opts.fields
+            if field.column in (projection or ()) and
+                self.connection.creation.db_type(field) in
+                    ('datetime', 'date', 'time'))
+        self.gae_query = [self._make_query(query, projection, keys_only)
+                          for query in self.gae_query]
+
     @safe_call
     def _build_query(self):
+        if not self.projected:
+            self._project()
         for query in self.gae_query:
             query.Order(*self.ordering)
         if len(self.gae_query) > 1:
-            return MultiQuery(self.gae_query, self.ordering)
+            return MergedQuery(self.gae_query, self.ordering)
         return self.gae_query[0]
 
+    def _skip_excluded(self, results, low_mark=0, high_mark=None):
+        """
+        Drops the excluded primary keys from the results, applying the
+        offset and limit that couldn't be run on the datastore.
+        """
+        if not self.excluded_pks:
+            return results
+        excluded = set(self.excluded_pks)
+        results = (entity for entity in results
+                   if get_key(entity) not in excluded)
+        return islice(results, low_mark, high_mark)
+
+    def _count_keys(self, limit=NOT_PROVIDED):
+        """
+        Counts the distinct entities matched by the sub-queries and
+        not excluded, using keys-only queries limited to the number of
+        keys needed.
+        """
+        if limit is NOT_PROVIDED:
+            limit = 1000
+        excluded = set(self.excluded_pks)
+        kw = dict(self.config or {})
+        if limit is not None:
+            kw['limit'] = limit + len(excluded)
+        # Run sends the first RPC of every query right away.
+        runs = [self._make_query(query, keys_only=True).Run(**kw)
+                for query in self.gae_query]
+
+        @safe_call
+        def resolve():
+            keys = set()
+            for results in runs:
+                keys.update(results)
+            count = len(keys - excluded)
+            if limit is not None:
+                count = min(count, limit)
+            return count
+        return NonrelResult(resolve)
+
+    def _run(self, low_mark=0, high_mark=None):
+        """
+        Starts running the query, returning an iterable over the
+        entities or keys, or the NonrelResult of the Get for queries
+        filtering on primary keys.
+        """
+        query = self._build_query()
+        if high_mark is not None and high_mark <= low_mark:
+            return ()
+        if self.excluded_pks:
+            # Excluded entities may be anywhere in the results, so the
+            # offset is applied once they're dropped.
+            if high_mark is not None:
+                high_mark += len(self.excluded_pks)
+            low_mark = 0
+        if self.included_pks is not None:
+            return self.get_matching_pk_async(low_mark, high_mark)
+
+        kw = {}
+        if self.config:
+            kw.update(self.config)
+
+        if low_mark:
+            kw['offset'] = low_mark
+        else:
+            low_mark = 0
+
+        if high_mark:
+            kw['limit'] = high_mark - low_mark
+
+        results = query.Run(**kw)
+
+        if not isinstance(query, MergedQuery):
+            def get_cursor():
+                return query.GetCursor()
+            self.query._gae_cursor = get_cursor
+        return results
+
     def get_matching_pk(self, low_mark=0, high_mark=None):
+        return self.get_matching_pk_async(low_mark, high_mark).get_result()
+
+    def get_matching_pk_async(self, low_mark=0, high_mark=None):
+        """
+        Starts getting the entities with the included primary keys,
+        returning a NonrelResult with the ones matching the filters.
+        """
         if not self.included_pks:
-            return []
+            return NonrelResult(lambda: [])
 
         config = self.config.copy()
 
@@ -332,16 +523,21 @@ class GAEQuery(NonrelQuery):
         if 'batch_size' in config:
             del config['batch_size']
 
-        results = [result for result in Get(self.included_pks, **config)
-                   if result is not None and
-                       self.matches_filters(result)]
-        if self.ordering:
-            results.sort(cmp=self.order_pk_filtered)
-        if high_mark is not None and high_mark < len(results) - 1:
-            results = results[:high_mark]
-        if low_mark:
-            results = results[low_mark:]
-        return results
+        rpc = GetAsync(self.included_pks, **config)
+
+        @safe_call
+        def resolve():
+            results = [result for result in rpc.get_result()
+                       if result is not None and
+                           self.matches_filters(result)]
+            if self.ordering:
+                results.sort(cmp=self.order_pk_filtered)
+            if high_mark is not None and high_mark < len(results) - 1:
+                results = results[:high_mark]
+            if low_mark:
+                results = results[low_mark:]
+            return results
+        return NonrelResult(resolve)
 
     def order_pk_filtered(self, lhs, rhs):
         left = dict(lhs)
@@ -418,7 +614,9 @@ class SQLInsertCompiler(NonrelInsertCompiler, SQLCompiler):
             entity_list.append(entity)
 
         keys = Put(entity_list)
-        return keys[0] if isinstance(keys, list) else keys
+        if isinstance(keys, list) and len(keys) == 1:
+            return keys[0]
+        return keys
 
 
 class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
@@ -433,8 +631,29 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
         return len(pks)
 
     def update_entities(self, pks, pk_field):
-        for pk in pks:
-            self.update_entity(pk[0], pk_field)
+        options = self.connection.settings_dict
+        if options.get('UPDATE_MODE', 'transactional') != 'batch':
+            for pk in pks:
+                self.update_entity(pk[0], pk_field)
+            return
+
+        gae_query = self.build_query()
+        keys = [self.ops.value_for_db(pk[0], pk_field) for pk in pks]
+        if self.has_expressions():
+            # Values computed from the stored ones have to be read and
+            # written atomically, use a transaction per entity group.
+            groups = {}
+            for key in keys:
+                root = key
+                while root.parent() is not None:
+                    root = root.parent()
+                groups.setdefault(root, []).append(key)
+            for group_keys in groups.values():
+                self.update_entity_group(group_keys, gae_query)
+        else:
+            batch_size = options.get('UPDATE_BATCH_SIZE', 500)
+            for index in range(0, len(keys), batch_size):
+                self.update_batch(keys[index:index + batch_size], gae_query)
 
     @commit_locked
     def update_entity(self, pk, pk_field):
@@ -444,6 +663,31 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
         if not gae_query.matches_filters(entity):
             return
 
+        self.apply_values(entity)
+        Put(entity)
+
+    @commit_locked
+    def update_entity_group(self, keys, gae_query):
+        self.update_batch(keys, gae_query)
+
+    def update_batch(self, keys, gae_query):
+        """
+        Updates the entities with the given keys using a single batch
+        Get and a single batch Put.
+        """
+        entities = [entity for entity in Get(keys)
+                    if entity is not None and
+                        gae_query.matches_filters(entity)]
+        for entity in entities:
+            self.apply_values(entity)
+        if entities:
+            Put(entities)
+
+    def has_expressions(self):
+        return any(hasattr(value, 'evaluate')
+                   for field, _, value in self.query.values)
+
+    def apply_values(self, entity):
         for field, _, value in self.query.values:
             if hasattr(value, 'prepare_database_save'):
                 value = value.prepare_database_save(field)
@@ -462,8 +706,6 @@ class SQLUpdateCompiler(NonrelUpdateCompiler, SQLCompiler):
 
             entity[field.column] = self.ops.value_for_db(value, field)
 
-        Put(entity)
-
 
 class SQLDeleteCompiler(NonrelDeleteCompiler, SQLCompiler):
     pass
@@ -0,0 +1,98 @@
+import heapq
+from itertools import islice
+
+from google.appengine.api.datastore import Query
+from google.appengine.api.datastore_types import Key
+
+
+def get_key(entity):
+    if isinstance(entity, Key):
+        return entity
+    return entity.key()
+
+
+class SortKey(object):
+    """
+    Compares entities the way the datastore orders query results:
+    by the ordering properties, using the smallest value of list
+    properties in ascending orders and the largest in descending
+    ones, and by key for entities with equal values.
+    """
+    __slots__ = ('values',)
+
+    def __init__(self, entity, ordering):
+        values = []
+        for column, direction in ordering:
+            if column == '__key__':
+                value = get_key(entity)
+            else:
+                value = entity.get(column)
+                if isinstance(value, list):
+                    if not value:
+                        value = None
+                    elif direction == Query.ASCENDING:
+                        value = min(value)
+                    else:
+                        value = max(value)
+            values.append((value, direction == Query.ASCENDING))
+        values.append((get_key(entity), True))
+        self.values = values
+
+    def __lt__(self, other):
+        for (value, ascending), (other_value, _) in zip(self.values,
+                                                        other.values):
+            result = cmp(value, other_value)
+            if result:
+                return result < 0 if ascending else result > 0
+        return False
+
+
+class MergedQuery(object):
+    """
+    Runs datastore queries with the same ordering as a single query,
+    replacing MultiQuery for the sub-queries built for __in and
+    negated __exact filters.
+
+    Every sub-query is started at once and fetches at most the number
+    of results needed (offset + limit), results are merged with a heap
+    on the requested ordering and entities matched by several
+    sub-queries are returned only once.
+    """
+
+    def __init__(self, queries, ordering):
+        self.queries = queries
+        self.ordering = ordering
+
+    def __repr__(self):
+        return '<MergedQuery: %r ORDER %r>' % (self.queries, self.ordering)
+
+    def Run(self, offset=None, limit=None, **config):
+        offset = offset or 0
+        if limit is not None:
+            config['limit'] = offset + limit
+            end = offset + limit
+        else:
+            end = None
+        # Run sends the first RPC of every sub-query right away.
+        runs = [query.Run(**config) for query in self.queries]
+        return islice(self._merge(runs), offset, end)
+
+    def _merge(self, runs):
+        heap = []
+        for index, results in enumerate(runs):
+            self._push(heap, index, iter(results))
+        seen = set()
+        while heap:
+            _, index, entity, results = heapq.heappop(heap)
+            key = get_key(entity)
+            if key not in seen:
+                seen.add(key)
+                yield entity
+            self._push(heap, index, results)
+
+    def _push(self, heap, index, results):
+        for entity in results:
+            # The index keeps entities from being compared.
+            heapq.heappush(heap, (SortKey(entity, self.ordering), index,
+                                  entity, results))
+            return
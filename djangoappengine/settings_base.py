@@ -31,6 +31,14 @@ DATABASES = {
         # changing! Defaults to False if not set.
         # 'STORE_RELATIONS_AS_DB_KEYS': True,
 
+        # QuerySet.update() runs a transaction per updated entity by
+        # default. 'batch' updates entities with batch Gets and Puts of
+        # UPDATE_BATCH_SIZE entities instead, only using a transaction
+        # per entity group when F() expressions are involved. Concurrent
+        # writes to the updated entities may be overwritten in this mode.
+        # 'UPDATE_MODE': 'batch',
+        # 'UPDATE_BATCH_SIZE': 500,
+
         'DEV_APPSERVER_OPTIONS': {
             # Optional parameters for development environment.
 
@@ -6,4 +6,4 @@ from .keys import KeysTest
 from .mapreduce_input_readers import DjangoModelInputReaderTest, DjangoModelIteratorTest
 from .not_return_sets import NonReturnSetsTest
 from .order import OrderTest
-from .transactions import TransactionTest
+from .transactions import TransactionTest, BatchUpdateTest
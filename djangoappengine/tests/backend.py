@@ -29,3 +29,29 @@ class BackendTest(TestCase):
         self.assertEqual(A.objects.all()[0].value, 3)
         self.assertRaises(DatabaseError, B.objects.count)
         self.assertRaises(DatabaseError, lambda: B.objects.all()[0])
+
+    def test_bulk_create(self):
+        objs = A.objects.bulk_create([A(value=i) for i in range(5)])
+        self.assertTrue(all(obj.pk is not None for obj in objs))
+        self.assertEqual(len(set(obj.pk for obj in objs)), 5)
+        self.assertEqual(sorted(A.objects.values_list('value', flat=True)),
+                         range(5))
+        self.assertEqual(A.objects.get(pk=objs[3].pk).value, 3)
+
+    def test_bulk_create_batch_size(self):
+        from django.db import connections
+        ops = connections['default'].ops
+        self.assertEqual(ops.bulk_batch_size([], range(1000)), 500)
+        A.objects.bulk_create([A(value=i) for i in range(7)], batch_size=3)
+        self.assertEqual(A.objects.count(), 7)
+
+    def test_prefetch(self):
+        from djangotoolbox.db.utils import count_async, prefetch
+        objs = A.objects.bulk_create([A(value=i) for i in range(5)])
+        count = count_async(A.objects.all())
+        first = prefetch(A.objects.order_by('value')[:2])
+        by_pk = prefetch(A.objects.filter(pk__in=[objs[1].pk, objs[4].pk]))
+        self.assertEqual(count.get_result(), 5)
+        self.assertEqual([obj.value for obj in first], [0, 1])
+        self.assertEqual(sorted(obj.value for obj in by_pk), [1, 4])
+        self.assertEqual(count_async(A.objects.filter(value__gt=2)).get_result(), 2)
@@ -378,6 +378,48 @@ class FilterTest(TestCase):
         orders = [post.order for post in posts]
         self.assertEqual(orders, range(5, 0, -1))
 
+    def test_in_merge(self):
+        from djangotoolbox.fields import ListField
+
+        class Post(models.Model):
+            tags = ListField(models.CharField(max_length=10))
+            order = models.IntegerField()
+
+        Post(tags=['a', 'b'], order=1).save()
+        Post(tags=['b'], order=2).save()
+        Post(tags=['a', 'c'], order=3).save()
+        Post(tags=['c'], order=4).save()
+        posts = Post.objects.filter(tags__in=['a', 'b', 'c']).order_by('-order')
+        self.assertEqual([post.order for post in posts], [4, 3, 2, 1])
+        self.assertEqual([post.order for post in posts[1:3]], [3, 2])
+        self.assertEqual(
+            list(posts.values_list('order', flat=True)[:2]), [4, 3])
+        self.assertEqual(Post.objects.filter(tags__in=['a', 'b']).count(), 3)
+        self.assertEqual(
+            Post.objects.filter(tags__in=['a', 'b'])[:2].count(), 2)
+
+    def test_pk_in_with_filters(self):
+        # Entities got by key are filtered in memory.
+        query = FieldsWithOptionsModel.objects.filter(
+            pk__in=['app-engine@scholardocs.com', 'sharingan@uchias.com',
+                    'rinnengan@sage.de']).order_by('email')
+        self.assertEquals(
+            [entity.email for entity in query.filter(floating_point__lt=3)],
+            ['sharingan@uchias.com'])
+        self.assertEquals(
+            [entity.email for entity in query.exclude(floating_point__lt=3)],
+            ['app-engine@scholardocs.com', 'rinnengan@sage.de'])
+        self.assertEquals(
+            [entity.email for entity in query.exclude(
+                Q(floating_point__lt=3) | Q(floating_point__gt=9))],
+            ['app-engine@scholardocs.com'])
+
+    def test_exclude_pk_slice(self):
+        query = OrderedModel.objects.exclude(pk__in=[1, 3]).order_by('pk')
+        self.assertEquals([entity.pk for entity in query[1:]], [4])
+        self.assertEquals(query.count(), 2)
+        self.assertEquals(query[:1].count(), 1)
+
     def test_inequality(self):
         self.assertEquals(
             [entity.email for entity in FieldsWithOptionsModel.objects
@@ -484,3 +526,30 @@ class FilterTest(TestCase):
         self.assertEqual(e['data'], x.data)
         x = BlobModel.objects.all()[0]
         self.assertEqual(e['data'], x.data)
+
+    def test_projection(self):
+        query = DateTimeModel.objects.values_list('datetime', flat=True)
+        self.assertEqual(sorted(query), self.datetimes)
+        self.assertEquals(
+            list(EmailModel.objects.filter(email__startswith='r')
+                 .order_by('email').values_list('email', flat=True)),
+            ['rasengan@naruto.com', 'rinnengan@sage.de'])
+        entity = EmailModel.objects.only('email').get(email='sharingan@uchias.com')
+        self.assertEqual(entity.email, 'sharingan@uchias.com')
+
+    def test_projection_fields(self):
+        compiler = DateTimeModel.objects.values('datetime').query.get_compiler(
+            'default')
+        gae_query = compiler.build_query(compiler.get_fields())
+        self.assertEqual(gae_query.projection, ('datetime',))
+        # Keys only queries don't need a projection.
+        compiler = DateTimeModel.objects.values('pk').query.get_compiler(
+            'default')
+        gae_query = compiler.build_query(compiler.get_fields())
+        self.assertTrue(gae_query.pks_only)
+        self.assertEqual(gae_query.projection, None)
+        # Unindexed fields can't be projected.
+        compiler = BlobModel.objects.values('data').query.get_compiler(
+            'default')
+        gae_query = compiler.build_query(compiler.get_fields())
+        self.assertEqual(gae_query.projection, None)
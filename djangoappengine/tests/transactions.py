@@ -56,3 +56,39 @@ class TransactionTest(TestCase):
         self.assertEqual(1, len(EmailModel.objects.all().filter(number=294)))
 
        # TODO: Tests for: sub, muld, div, mod, ....
+
+
+class BatchUpdateTest(TransactionTest):
+    """
+    Runs the update tests with batched updates.
+    """
+
+    def setUp(self):
+        from django.db import connections
+        from ..db.base import DatabaseWrapper
+        self.options = [connection.settings_dict
+                        for connection in connections.all()
+                        if isinstance(connection, DatabaseWrapper)]
+        for options in self.options:
+            options['UPDATE_MODE'] = 'batch'
+            options['UPDATE_BATCH_SIZE'] = 2
+        super(BatchUpdateTest, self).setUp()
+
+    def tearDown(self):
+        for options in self.options:
+            del options['UPDATE_MODE']
+            del options['UPDATE_BATCH_SIZE']
+
+    def test_update_several_batches(self):
+        for number in range(4, 7):
+            EmailModel(email=self.emails[2], number=number).save()
+
+        # Five matching rows make two full batches and a partial one.
+        EmailModel.objects.all().filter(number__gte=2).update(
+            email=self.emails[3])
+
+        self.assertEqual(5, len(EmailModel.objects.all().filter(
+            email=self.emails[3])))
+        self.assertEqual([1], [email.number for email in
+                               EmailModel.objects.all().exclude(
+                                   email=self.emails[3])])
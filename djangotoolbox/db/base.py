@@ -15,6 +15,8 @@ from django.utils.safestring import EscapeString, EscapeUnicode, SafeString, \
     SafeUnicode
 from django.utils import timezone
 
+from djangotoolbox.fields import LazyCollection
+
 from .creation import NonrelDatabaseCreation
 
 
@@ -50,6 +52,10 @@ class NonrelDatabaseFeatures(BaseDatabaseFeatures):
              'AbstractIterableField', 'ListField', 'SetField', 'DictField',
              'EmbeddedModelField', 'BlobField'))
 
+    # Inserting several objects at once is done with a single call to
+    # the back-end's insert, see NonrelDatabaseOperations.bulk_batch_size.
+    has_bulk_insert = True
+
     # Django 1.4 compatibility
     def _supports_transactions(self):
         return False
@@ -94,6 +100,15 @@ class NonrelDatabaseOperations(BaseDatabaseOperations):
           `RelatedField.get_db_prep_lookup`).
     """
 
+    # Maximum number of objects written by a single insert, back-ends
+    # with a batch limit should set it.
+    max_insert_batch_size = None
+
+    def __init__(self, connection):
+        super(NonrelDatabaseOperations, self).__init__(connection)
+        self._conversion_plans = {}
+        self._embedded_model_plans = {}
+
     def pk_default_value(self):
         """
         Returns None, to be interpreted by back-ends as a request to
@@ -101,6 +116,14 @@ class NonrelDatabaseOperations(BaseDatabaseOperations):
         """
         return None
 
+    def bulk_batch_size(self, fields, objs):
+        """
+        Chunks bulk inserts by the back-end's batch limit.
+        """
+        if self.max_insert_batch_size is None:
+            return len(objs)
+        return min(len(objs), self.max_insert_batch_size)
+
     def quote_name(self, name):
         """
         Does not do any quoting, as it is not needed for most NoSQL
@@ -253,11 +276,45 @@ class NonrelDatabaseOperations(BaseDatabaseOperations):
         """
         return self._value_from_db(value, *self._convert_as(field))
 
+    def value_from_db_converter(self, field, lazy=False):
+        """
+        Returns a function deconverting database values for the field,
+        same as `value_from_db`, but with the conversion parameters
+        computed once, for decoding many values.
+
+        :param lazy: Return collections of embedded models as a
+                     LazyCollection, to be deconverted when the
+                     field is accessed on the model instance
+        """
+        field, field_kind, db_type = self._convert_as(field)
+        value_from_db = self._value_from_db
+        deconvert = lambda value: value_from_db(value, field, field_kind,
+                                                db_type)
+        if lazy and field_kind in ('ListField', 'SetField') and \
+                field.item_field.get_internal_type() == 'EmbeddedModelField':
+            return lambda value: None if value is None else \
+                LazyCollection(value, deconvert)
+        return deconvert
+
     def _convert_as(self, field, lookup=None):
         """
         Computes parameters that should be used for preparing the field
         for the database or deconverting a database value for it.
+
+        These only depend on the field and on whether the lookup is a
+        month / day one, so they're computed once per field and cached.
         """
+        # Fields are keyed by identity (they compare by creation order),
+        # the cache holds a reference to the field so its id stays valid.
+        key = (id(field), lookup in ('month', 'day'))
+        try:
+            return self._conversion_plans[key][1]
+        except KeyError:
+            plan = self._compute_conversion_plan(field, lookup)
+            self._conversion_plans[key] = (field, plan)
+            return plan
+
+    def _compute_conversion_plan(self, field, lookup):
         # We need to compute db_type using the original field to allow
         # GAE to use different storage for primary and foreign keys.
         db_type = self.connection.creation.db_type(field)
@@ -589,11 +646,25 @@ class NonrelDatabaseOperations(BaseDatabaseOperations):
         # Deconvert fields' values and prepare a dict that can be used
         # to initialize a model (by changing keys from columns to
         # attribute names).
+        value_from_db = self._value_from_db
         return embedded_model, dict(
-            (subfield.attname, self._value_from_db(
-                value[subfield.column], *self._convert_as(subfield)))
-            for subfield in embedded_model._meta.fields
-            if subfield.column in value)
+            (attname, value_from_db(value[column], *plan))
+            for column, attname, plan
+            in self._get_embedded_model_plan(embedded_model)
+            if column in value)
+
+    def _get_embedded_model_plan(self, model):
+        """
+        Returns (column, attname, conversion plan) for the fields of an
+        embedded model, computed once per model.
+        """
+        try:
+            return self._embedded_model_plans[model]
+        except KeyError:
+            plan = self._embedded_model_plans[model] = [
+                (subfield.column, subfield.attname, self._convert_as(subfield))
+                for subfield in model._meta.fields]
+            return plan
 
     def _value_for_db_key(self, value, field_kind):
         """
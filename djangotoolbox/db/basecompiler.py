@@ -58,6 +58,27 @@ EMULATED_OPS = {
 }
 
 
+class NonrelResult(object):
+    """
+    Result of a query that may still be running on the database.
+
+    Back-ends supporting asynchronous calls start the call when the
+    result is created and `resolve` waits for it; otherwise `resolve`
+    runs the whole query. The result is resolved once, on the first
+    `get_result` call.
+    """
+
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._result = NOT_PROVIDED
+
+    def get_result(self):
+        if self._result is NOT_PROVIDED:
+            self._result = self._resolve()
+            self._resolve = None
+        return self._result
+
+
 class NonrelQuery(object):
     """
     Base class for nonrel queries.
@@ -93,6 +114,7 @@ class NonrelQuery(object):
         self.query = compiler.query # sql.Query
         self.fields = fields
         self._negated = False
+        self._filter_predicate = (None, None)
 
     def fetch(self, low_mark=0, high_mark=None):
         """
@@ -107,6 +129,24 @@ class NonrelQuery(object):
         """
         raise NotImplementedError
 
+    def fetch_async(self, low_mark=0, high_mark=None):
+        """
+        Starts fetching some part of query results, returning a
+        NonrelResult with a list of the results.
+
+        Back-ends able to issue the fetch without waiting for it
+        should override this, by default the query is only run when
+        the result is requested.
+        """
+        return NonrelResult(lambda: list(self.fetch(low_mark, high_mark)))
+
+    def count_async(self, limit=None):
+        """
+        Starts counting the objects the query would return, returning
+        a NonrelResult with the number. See `fetch_async`.
+        """
+        return NonrelResult(lambda: self.count(limit))
+
     def delete(self):
         """
         Called by NonrelDeleteCompiler after it builds a delete query.
@@ -290,50 +330,88 @@ class NonrelQuery(object):
         """
         Checks if an entity returned by the database satisfies
         constraints in a WHERE tree (in-memory filtering).
+
+        The tree is compiled to a predicate the first time it's used
+        by the query, see `_compile_filters`.
+        """
+        # The tree is kept with its predicate and compared by identity,
+        # so a new tree is never matched with an old tree's predicate.
+        compiled_filters, predicate = self._filter_predicate
+        if compiled_filters is not filters:
+            predicate = self._compile_filters(filters)
+            self._filter_predicate = (filters, predicate)
+        return predicate(entity)
+
+    def _compile_filters(self, filters):
+        """
+        Turns a WHERE tree into a function checking if an entity (a
+        dict using column names as keys) satisfies its constraints.
+
+        Lookup values are decoded once, when the tree is compiled,
+        rather than for every entity.
         """
 
         # Filters without rules match everything.
         if not filters.children:
-            return True
-
-        result = filters.connector == AND
+            return lambda entity: True
 
+        predicates = []
         for child in filters.children:
-
-            # Recursively check a subtree,
             if isinstance(child, Node):
-                submatch = self._matches_filters(entity, child)
-
-            # Check constraint leaf, emulating a database condition.
+                predicates.append(self._compile_filters(child))
             else:
-                field, lookup_type, lookup_value = self._decode_child(child)
-                entity_value = entity[field.column]
-
-                if entity_value is None:
-                    if isinstance(lookup_value, (datetime.datetime, datetime.date,
-                                          datetime.time)):
-                        submatch = lookup_type in ('lt', 'lte')
-                    elif lookup_type in (
-                            'startswith', 'contains', 'endswith', 'iexact',
-                            'istartswith', 'icontains', 'iendswith'):
-                        submatch = False
-                    else:
-                        submatch = EMULATED_OPS[lookup_type](
-                            entity_value, lookup_value)
-                else:
-                    submatch = EMULATED_OPS[lookup_type](
-                        entity_value, lookup_value)
-
-            if filters.connector == OR and submatch:
-                result = True
-                break
-            elif filters.connector == AND and not submatch:
-                result = False
-                break
+                predicates.append(self._compile_leaf(child))
+
+        if len(predicates) == 1:
+            match = predicates[0]
+        elif filters.connector == OR:
+            def match(entity):
+                for predicate in predicates:
+                    if predicate(entity):
+                        return True
+                return False
+        else:
+            def match(entity):
+                for predicate in predicates:
+                    if not predicate(entity):
+                        return False
+                return True
 
         if filters.negated:
-            return not result
-        return result
+            return lambda entity: not match(entity)
+        return match
+
+    def _compile_leaf(self, child):
+        """
+        Returns a function emulating a database condition for a
+        constraint leaf.
+        """
+        field, lookup_type, lookup_value = self._decode_child(child)
+        column = field.column
+        op = EMULATED_OPS.get(lookup_type)
+        if op is None:
+            # Only fail if an entity actually reaches the lookup, as a
+            # short-circuited tree never needed it.
+            def unsupported(entity):
+                raise DatabaseError("Lookup type %r isn't supported." %
+                                    lookup_type)
+            return unsupported
+
+        if isinstance(lookup_value, (datetime.datetime, datetime.date,
+                                     datetime.time)):
+            none_match = lookup_type in ('lt', 'lte')
+        elif lookup_type in ('startswith', 'contains', 'endswith', 'iexact',
+                             'istartswith', 'icontains', 'iendswith'):
+            none_match = False
+        else:
+            none_match = op(None, lookup_value)
+
+        def predicate(entity):
+            entity_value = entity[column]
+            if entity_value is None:
+                return none_match
+            return op(entity_value, lookup_value)
+        return predicate
 
     def _order_in_memory(self, lhs, rhs):
         for field, ascending in self.compiler._get_ordering():
@@ -369,7 +447,16 @@ class NonrelCompiler(SQLCompiler):
         """
         Returns an iterator over the results from executing query given
         to this compiler. Called by QuerySet methods.
+
+        If the results were prefetched with `results_iter_async` the
+        already started fetch is used.
         """
+        prefetched = self.query.__dict__.pop('_nonrel_results', None)
+        if prefetched is not None:
+            return iter(prefetched.get_result())
+        return self._results_iter()
+
+    def _results_iter(self):
         fields = self.get_fields()
         try:
             results = self.build_query(fields).fetch(
@@ -377,8 +464,24 @@ class NonrelCompiler(SQLCompiler):
         except EmptyResultSet:
             results = []
 
+        make_result = self._get_result_maker(fields)
         for entity in results:
-            yield self._make_result(entity, fields)
+            yield make_result(entity)
+
+    def results_iter_async(self):
+        """
+        Starts fetching the results of the query, returning a
+        NonrelResult with the list of result rows.
+        """
+        fields = self.get_fields()
+        try:
+            results = self.build_query(fields).fetch_async(
+                self.query.low_mark, self.query.high_mark)
+        except EmptyResultSet:
+            return NonrelResult(lambda: [])
+        make_result = self._get_result_maker(fields)
+        return NonrelResult(lambda: [make_result(entity)
+                                     for entity in results.get_result()])
 
     def has_results(self):
         return self.get_count(check_exists=True)
@@ -422,20 +525,39 @@ class NonrelCompiler(SQLCompiler):
         names as keys. Decodes values using `value_from_db` as well as
         the standard `convert_values`.
         """
-        result = []
-        for field in fields:
-            value = entity.get(field.column, NOT_PROVIDED)
-            if value is NOT_PROVIDED:
-                value = field.get_default()
-            else:
-                value = self.ops.value_from_db(value, field)
-                value = self.query.convert_values(value, field,
-                                                  self.connection)
-            if value is None and not field.null:
-                raise IntegrityError("Non-nullable field %s can't be None!" %
-                                     field.name)
-            result.append(value)
-        return result
+        return self._get_result_maker(fields)(entity)
+
+    def _get_result_maker(self, fields):
+        """
+        Returns a function decoding entities like `_make_result`, with
+        the deconversion of each field looked up once rather than for
+        every value of every entity.
+
+        Collections of embedded models are left for the model field to
+        deconvert on access, unless values are being selected.
+        """
+        convert_values = self.query.convert_values
+        connection = self.connection
+        lazy = not self.query.select
+        plan = [(field, field.column,
+                 self.ops.value_from_db_converter(field, lazy=lazy))
+                for field in fields]
+
+        def make_result(entity):
+            result = []
+            for field, column, value_from_db in plan:
+                value = entity.get(column, NOT_PROVIDED)
+                if value is NOT_PROVIDED:
+                    value = field.get_default()
+                else:
+                    value = convert_values(value_from_db(value), field,
+                                           connection)
+                if value is None and not field.null:
+                    raise IntegrityError("Non-nullable field %s can't be "
+                                         "None!" % field.name)
+                result.append(value)
+            return result
+        return make_result
 
     def check_query(self):
         """
@@ -469,6 +591,16 @@ class NonrelCompiler(SQLCompiler):
         except EmptyResultSet:
             return 0
 
+    def get_count_async(self):
+        """
+        Starts counting objects matching the current filters, returning
+        a NonrelResult with the count.
+        """
+        try:
+            return self.build_query().count_async(self.query.high_mark)
+        except EmptyResultSet:
+            return NonrelResult(lambda: 0)
+
     def build_query(self, fields=None):
         """
         Checks if the underlying SQL query is supported and prepares
@@ -591,6 +723,14 @@ class NonrelInsertCompiler(NonrelCompiler):
 
         key = self.insert(to_insert, return_id=return_id)
 
+        if isinstance(key, (list, tuple)):
+            # Bulk insert, set the generated keys on the objects.
+            for obj, obj_key in zip(self.query.objs, key):
+                if getattr(obj, pk_field.attname) is None:
+                    setattr(obj, pk_field.attname, self.ops.convert_values(
+                        self.ops.value_from_db(obj_key, pk_field), pk_field))
+            key = key[0]
+
         # Pass the key value through normal database deconversion.
         return self.ops.convert_values(self.ops.value_from_db(key, pk_field), pk_field)
 
@@ -607,6 +747,8 @@ class NonrelInsertCompiler(NonrelCompiler):
                        database
         :param return_id: Whether to return the id or key of the newly
                           created entity
+        :returns: The key of the entity, or a list with the keys of all
+                  the entities if several were inserted
         """
         raise NotImplementedError
 
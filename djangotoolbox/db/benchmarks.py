@@ -0,0 +1,147 @@
+"""
+Micro-benchmarks for the in-memory filtering and the decoding of the
+results of nonrel queries.
+
+Run with settings using a nonrel database, e.g.:
+    DJANGO_SETTINGS_MODULE=settings python -m djangotoolbox.db.benchmarks
+"""
+import datetime
+from timeit import Timer
+
+from django.db.models.fields import NOT_PROVIDED
+from django.db.models.sql.where import AND, OR
+from django.db.utils import IntegrityError
+from django.utils.tree import Node
+
+from djangotoolbox.db.basecompiler import EMULATED_OPS
+
+
+def legacy_matches_filters(query, entity, filters):
+    """NonrelQuery._matches_filters as it was before WHERE trees were
+    compiled: the tree is walked and every lookup value decoded for each
+    entity."""
+    if not filters.children:
+        return True
+
+    result = filters.connector == AND
+
+    for child in filters.children:
+        if isinstance(child, Node):
+            submatch = legacy_matches_filters(query, entity, child)
+        else:
+            field, lookup_type, lookup_value = query._decode_child(child)
+            entity_value = entity[field.column]
+
+            if entity_value is None:
+                if isinstance(lookup_value, (datetime.datetime, datetime.date,
+                                      datetime.time)):
+                    submatch = lookup_type in ('lt', 'lte')
+                elif lookup_type in (
+                        'startswith', 'contains', 'endswith', 'iexact',
+                        'istartswith', 'icontains', 'iendswith'):
+                    submatch = False
+                else:
+                    submatch = EMULATED_OPS[lookup_type](
+                        entity_value, lookup_value)
+            else:
+                submatch = EMULATED_OPS[lookup_type](
+                    entity_value, lookup_value)
+
+        if filters.connector == OR and submatch:
+            result = True
+            break
+        elif filters.connector == AND and not submatch:
+            result = False
+            break
+
+    if filters.negated:
+        return not result
+    return result
+
+def legacy_make_result(compiler, entity, fields):
+    """NonrelCompiler._make_result as it was before conversion plans were
+    cached: the conversion parameters are computed for every value."""
+    ops = compiler.ops
+    result = []
+    for field in fields:
+        value = entity.get(field.column, NOT_PROVIDED)
+        if value is NOT_PROVIDED:
+            value = field.get_default()
+        else:
+            value = ops._value_from_db(
+                value, *ops._compute_conversion_plan(field, None))
+            value = compiler.query.convert_values(value, field,
+                                                  compiler.connection)
+        if value is None and not field.null:
+            raise IntegrityError("Non-nullable field %s can't be None!" %
+                                 field.name)
+        result.append(value)
+    return result
+
+def get_query():
+    from django.contrib.auth.models import User
+    from django.db.models import Q
+    queryset = User.objects.filter(
+        Q(username__in=['alice', 'bob', 'carol']) | Q(is_staff=True),
+        is_active=True, date_joined__gte=datetime.datetime(2013, 1, 1))
+    compiler = queryset.query.get_compiler(queryset.db)
+    return compiler.build_query(compiler.get_fields())
+
+def get_entities(query):
+    """Returns entities as the database would, converting the values
+    with value_for_db."""
+    names = ['alice', 'bob', 'carol', 'dave', 'eve']
+    entities = []
+    for index in range(100):
+        values = {
+            'id': index + 1,
+            'username': names[index % len(names)],
+            'first_name': u'',
+            'last_name': u'',
+            'email': u'%s@example.com' % names[index % len(names)],
+            'password': 'sha1$%d' % index,
+            'is_staff': index % 7 == 0,
+            'is_active': index % 3 != 0,
+            'is_superuser': False,
+            'last_login': datetime.datetime(2013, 1, 1),
+            'date_joined': datetime.datetime(2012 + index % 3, 1, 1),
+        }
+        entities.append(dict(
+            (field.column, query.ops.value_for_db(values[field.attname], field))
+            for field in query.fields))
+    return entities
+
+def run(functions, entities, number):
+    results = []
+    for name, function in functions:
+        timer = Timer(lambda: [function(entity) for entity in entities])
+        best = min(timer.repeat(repeat=3, number=number))
+        results.append((name, best / number / len(entities) * 1000000))
+    return results
+
+def benchmark(number=20):
+    query = get_query()
+    compiler = query.compiler
+    where = query.query.where
+    fields = query.fields
+    entities = get_entities(query)
+    filters = run((
+        ('legacy', lambda entity: legacy_matches_filters(query, entity, where)),
+        ('compiled', lambda entity: query._matches_filters(entity, where)),
+    ), entities, number)
+    make_result = compiler._get_result_maker(fields)
+    decoding = run((
+        ('legacy', lambda entity: legacy_make_result(compiler, entity, fields)),
+        ('planned', make_result),
+    ), entities, number)
+    return len(entities), filters, decoding
+
+def main():
+    count, filters, decoding = benchmark()
+    for title, results in (('Filtering', filters), ('Decoding', decoding)):
+        print '%s %d entities (us per entity):' % (title, count)
+        for name, elapsed in results:
+            print '  %-10s %8.3f' % (name, elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -31,3 +31,31 @@ def decimal_to_string(value, max_digits=16, decimal_places=0):
     if n < max_digits - decimal_places:
         value = u'0' * (max_digits - decimal_places - n) + value
     return sign + value
+
+
+def prefetch(queryset):
+    """
+    Starts fetching the results of a queryset, without waiting for
+    them. The results are collected when the queryset is evaluated, so
+    several querysets can be fetched concurrently:
+
+        posts = prefetch(Post.objects.all()[:10])
+        count = count_async(Post.objects.all())
+        ...
+        render(..., {'posts': posts, 'count': count.get_result()})
+
+    The queryset is returned for convenience, filtering or slicing it
+    again creates a new query that doesn't use the prefetched results.
+    """
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    queryset.query._nonrel_results = compiler.results_iter_async()
+    return queryset
+
+
+def count_async(queryset):
+    """
+    Starts counting the objects of a queryset, returning a result
+    whose `get_result` method waits for the count.
+    """
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    return compiler.get_count_async()
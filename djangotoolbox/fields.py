@@ -14,6 +14,57 @@ __all__ = ('RawField', 'ListField', 'SetField', 'DictField',
 
 EMPTY_ITER = ()
 
+# (attname, to_python, get_default) of the fields of embedded models,
+# see EmbeddedModelField.to_python.
+_field_plans = {}
+
+
+class LazyCollection(object):
+    """
+    Raw value of a collection of embedded models loaded from the
+    database. The value is deconverted and the embedded instances are
+    created only when the field is accessed, see LazyCreator.
+
+    :param values: Value as stored in the database
+    :param deconvert: Function deconverting the stored value, None if
+                      the values are already deconverted
+    """
+    __slots__ = ('values', 'deconvert')
+
+    def __init__(self, values, deconvert=None):
+        self.values = values
+        self.deconvert = deconvert
+
+    def resolve(self):
+        if self.deconvert is None:
+            return self.values
+        return self.deconvert(self.values)
+
+    def __reduce__(self):
+        # The deconversion function can't be pickled.
+        return LazyCollection, (self.resolve(),)
+
+
+class LazyCreator(Creator):
+    """
+    Creator that keeps LazyCollection values as they are until the
+    field is read.
+    """
+
+    def __get__(self, obj, type=None):
+        if obj is None:
+            raise AttributeError("Can only be accessed via an instance.")
+        value = obj.__dict__[self.field.name]
+        if isinstance(value, LazyCollection):
+            value = self.field.to_python(value.resolve())
+            obj.__dict__[self.field.name] = value
+        return value
+
+    def __set__(self, obj, value):
+        if not isinstance(value, LazyCollection):
+            value = self.field.to_python(value)
+        obj.__dict__[self.field.name] = value
+
 
 class _FakeModel(object):
     """
@@ -83,7 +134,7 @@ class AbstractIterableField(models.Field):
         # If items' field uses SubfieldBase we also need to.
         item_metaclass = getattr(self.item_field, '__metaclass__', None)
         if item_metaclass and issubclass(item_metaclass, models.SubfieldBase):
-            setattr(cls, self.name, Creator(self))
+            setattr(cls, self.name, LazyCreator(self))
 
         if isinstance(self.item_field, models.ForeignKey) and isinstance(self.item_field.rel.to, basestring):
             """
@@ -327,15 +378,21 @@ class EmbeddedModelField(models.Field):
         else:
             return value
 
-        # Pass values through respective fields' to_python, leaving
-        # fields for which no value is specified uninitialized.
-        attribute_values = dict(
-            (field.attname, field.to_python(attribute_values[field.attname]))
-            for field in embedded_model._meta.fields
-            if field.attname in attribute_values)
-
-        # Create the model instance.
-        instance = embedded_model(**attribute_values)
+        # Pass values through respective fields' to_python, using
+        # defaults for fields for which no value is specified.
+        try:
+            plan = _field_plans[embedded_model]
+        except KeyError:
+            plan = _field_plans[embedded_model] = [
+                (field.attname, field.to_python, field.get_default)
+                for field in embedded_model._meta.fields]
+        args = [to_python(attribute_values[attname])
+                if attname in attribute_values else get_default()
+                for attname, to_python, get_default in plan]
+
+        # Create the model instance, positional arguments take the
+        # faster path through Model.__init__.
+        instance = embedded_model(*args)
         instance._state.adding = False
         return instance
 
@@ -0,0 +1,205 @@
+import gzip
+import os
+import sys
+import traceback
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.management.commands import loaddata
+from django.db import connections, router
+from django.db.models import get_apps, signals
+from django.utils.itercompat import product
+
+from djangotoolbox.db.base import NonrelDatabaseOperations
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+
+class InsertBuffer(object):
+    """
+    Collects the objects of a fixture per model and writes them using
+    the back-end's bulk insert, sending the signals a raw save sends.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.objs = {}
+
+    def add(self, obj):
+        key = (obj.__class__, obj.pk is None)
+        self.objs.setdefault(key, []).append(obj)
+
+    def flush(self, model, generate_pk):
+        objs = self.objs.pop((model, generate_pk), None)
+        if not objs:
+            return
+        meta = model._meta
+        fields = meta.local_fields
+        if generate_pk:
+            fields = [field for field in fields if field is not meta.pk]
+        ops = connections[self.using].ops
+        batch_size = max(ops.bulk_batch_size(fields, objs), 1)
+        for start in range(0, len(objs), batch_size):
+            batch = objs[start:start + batch_size]
+            for obj in batch:
+                signals.pre_save.send(sender=model, instance=obj, raw=True,
+                                      using=self.using)
+            model._base_manager._insert(batch, fields=fields, raw=True,
+                                        using=self.using)
+            for obj in batch:
+                obj._state.db = self.using
+                obj._state.adding = False
+                signals.post_save.send(sender=model, instance=obj,
+                                       created=True, raw=True,
+                                       using=self.using)
+
+    def flush_all(self):
+        for model, generate_pk in self.objs.keys():
+            self.flush(model, generate_pk)
+
+
+class Command(loaddata.Command):
+    """
+    Loads fixtures using batch inserts on back-ends supporting them,
+    so a fixture costs a few batch writes instead of one per object.
+
+    Fixtures are looked up like Django's loaddata does, but are read
+    by this command's own handle: the objects are buffered per model
+    and inserted at the end, without the per object existence checks
+    of a save nor the transaction and sequence handling nonrel
+    back-ends don't have.
+    """
+
+    def handle(self, *fixture_labels, **options):
+        using = options.get('database')
+        connection = connections[using]
+        if not (connection.features.has_bulk_insert and
+                isinstance(connection.ops, NonrelDatabaseOperations)):
+            return super(Command, self).handle(*fixture_labels, **options)
+
+        self.style = no_style()
+        verbosity = int(options.get('verbosity'))
+        if not fixture_labels:
+            self.stderr.write(self.style.ERROR(
+                "No database fixture specified. Please provide the path of "
+                "at least one fixture in the command line.\n"))
+            return
+
+        buffer = InsertBuffer(using)
+        fixture_count = loaded_object_count = fixture_object_count = 0
+        full_path = None
+        try:
+            for fixture_label in fixture_labels:
+                fixtures = self.find_fixtures(fixture_label, using)
+                if not fixtures:
+                    continue
+                for full_path, format, open_method in fixtures:
+                    if verbosity >= 2:
+                        self.stdout.write("Installing %s fixture '%s'.\n" %
+                                          (format, full_path))
+                    fixture_count += 1
+                    objects_in_fixture = 0
+                    fixture = open_method(full_path, 'r')
+                    try:
+                        for obj in serializers.deserialize(format, fixture,
+                                                           using=using):
+                            objects_in_fixture += 1
+                            if not router.allow_syncdb(using,
+                                                       obj.object.__class__):
+                                continue
+                            loaded_object_count += 1
+                            # Inherited and proxy models need their parents
+                            # saved first and many-to-many data needs the
+                            # saved object, save those one by one.
+                            meta = obj.object._meta
+                            if obj.m2m_data or meta.parents or meta.proxy:
+                                obj.save(using=using)
+                            else:
+                                buffer.add(obj.object)
+                    finally:
+                        fixture.close()
+                    fixture_object_count += objects_in_fixture
+                    if objects_in_fixture == 0:
+                        self.stderr.write(self.style.ERROR(
+                            "No fixture data found for '%s'. (File format "
+                            "may be invalid.)\n" % full_path))
+                        return
+            buffer.flush_all()
+        except (SystemExit, KeyboardInterrupt):
+            raise
+        except Exception:
+            if options.get('traceback'):
+                traceback.print_exc()
+            else:
+                self.stderr.write(self.style.ERROR(
+                    "Problem installing fixture '%s': %s\n" %
+                    (full_path, ''.join(traceback.format_exception(
+                        *sys.exc_info())))))
+            return
+
+        if verbosity >= 1:
+            if fixture_object_count == loaded_object_count:
+                self.stdout.write("Installed %d object(s) from %d "
+                                  "fixture(s)\n" % (loaded_object_count,
+                                                     fixture_count))
+            else:
+                self.stdout.write("Installed %d object(s) (of %d) from %d "
+                                  "fixture(s)\n" % (loaded_object_count,
+                                                     fixture_object_count,
+                                                     fixture_count))
+
+    def find_fixtures(self, fixture_label, using):
+        """
+        Returns (path, format, open function) tuples for the fixture
+        files matching a label, searched like Django's loaddata does in
+        the fixtures directories of the apps, FIXTURE_DIRS and the
+        current directory.
+        """
+        compression_types = {None: open, 'gz': gzip.GzipFile}
+        if bz2 is not None:
+            compression_types['bz2'] = bz2.BZ2File
+
+        parts = fixture_label.split('.')
+        if len(parts) > 1 and parts[-1] in compression_types:
+            compression_formats = [parts[-1]]
+            parts = parts[:-1]
+        else:
+            compression_formats = compression_types.keys()
+        formats = serializers.get_public_serializer_formats()
+        if len(parts) == 1:
+            fixture_name = parts[0]
+        else:
+            fixture_name, format = '.'.join(parts[:-1]), parts[-1]
+            if format not in formats:
+                self.stderr.write(self.style.ERROR(
+                    "Problem installing fixture '%s': %s is not a known "
+                    "serialization format.\n" % (fixture_name, format)))
+                return []
+            formats = [format]
+
+        if os.path.isabs(fixture_name):
+            fixture_dirs = [fixture_name]
+        else:
+            fixture_dirs = [os.path.join(os.path.dirname(path), 'fixtures')
+                            for app in get_apps()
+                            for path in getattr(app, '__path__',
+                                                [app.__file__])]
+            fixture_dirs += list(settings.FIXTURE_DIRS) + ['']
+
+        fixtures = []
+        for fixture_dir in fixture_dirs:
+            for database, format, compression_format in product(
+                    [using, None], formats, compression_formats):
+                file_name = '.'.join(part for part in [
+                    fixture_name, database, format, compression_format]
+                    if part)
+                full_path = os.path.join(fixture_dir, file_name)
+                if os.path.isfile(full_path):
+                    fixtures.append((full_path, format,
+                                     compression_types[compression_format]))
+                    break
+        return fixtures
@@ -11,7 +11,8 @@ from django.dispatch.dispatcher import receiver
 from django.test import TestCase
 from django.utils.unittest import expectedFailure, skip
 
-from .fields import ListField, SetField, DictField, EmbeddedModelField
+from .fields import ListField, SetField, DictField, EmbeddedModelField, \
+    LazyCollection
 
 
 def count_calls(func):
@@ -412,6 +413,18 @@ class EmbeddedModelFieldTest(TestCase):
         self.assertNotEqual(instances[0].auto_now, None)
         self.assertEqual(instances[1].ordered_ints, range(1, 6))
 
+    def test_lazy_listfield(self):
+        EmbeddedModelFieldModel.objects.create(
+            typed_list2=[EmbeddedModel(someint=i) for i in xrange(3)])
+        obj = EmbeddedModelFieldModel.objects.get()
+        self.assertIsInstance(obj.__dict__['typed_list2'], LazyCollection)
+        self.assertEqual([embedded.someint for embedded in obj.typed_list2],
+                         range(3))
+        self.assertIsInstance(obj.__dict__['typed_list2'], list)
+        values = EmbeddedModelFieldModel.objects.values_list('typed_list2',
+                                                            flat=True)
+        self.assertNotIsInstance(values[0], LazyCollection)
+
     def test_untyped_dict(self):
         EmbeddedModelFieldModel.objects.create(untyped_dict={
             'a': SetModel(setfield=range(3)),
@@ -509,6 +522,43 @@ class SignalTest(TestCase):
         self.assertEqual(created, [True, False, False, False, False])
 
 
+class LoadDataTest(TestCase):
+
+    def test_loaddata(self):
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from django.db.models.signals import pre_save
+
+        saves = []
+
+        def record(signal):
+            def handle(sender, instance, raw, **kwargs):
+                saves.append((signal, instance.pk, raw))
+            return handle
+        pre_save_handler, post_save_handler = record('pre'), record('post')
+        pre_save.connect(pre_save_handler, sender=Target)
+        post_save.connect(post_save_handler, sender=Target)
+        fd, path = tempfile.mkstemp(suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as fixture:
+                json.dump([{'model': 'djangotoolbox.target', 'pk': pk,
+                            'fields': {'index': pk * 10}}
+                           for pk in (1, 2, 3)], fixture)
+            call_command('loaddata', path, verbosity=0)
+        finally:
+            os.remove(path)
+            pre_save.disconnect(pre_save_handler, sender=Target)
+            post_save.disconnect(post_save_handler, sender=Target)
+
+        self.assertEqual(sorted(Target.objects.values_list('pk', 'index')),
+                         [(1, 10), (2, 20), (3, 30)])
+        self.assertEqual(sorted(saves),
+                         [(signal, pk, True) for signal in ('post', 'pre')
+                          for pk in (1, 2, 3)])
+
+
 class SelectRelatedTest(TestCase):
 
     def test_select_related(self):
@@ -7,7 +7,7 @@ def autodiscover():
 
 def register(model, fields_to_index, search_index='search_index',
     indexer=None, splitter=default_splitter, relation_index=True, integrate='*',
-    filters={}, language=site_language, **kwargs):
+    filters={}, language=site_language, field_weights=None, **kwargs):
 
     """
     Add a search manager to the model.
@@ -21,6 +21,7 @@ def register(model, fields_to_index, search_index='search_index',
             ' property called %s.' % search_index)
 
     model.add_to_class(search_index, SearchManager(fields_to_index, indexer,
-        splitter, relation_index, integrate, filters, language, **kwargs))
+        splitter, relation_index, integrate, filters, language, field_weights,
+        **kwargs))
 
     install_index_model(model)
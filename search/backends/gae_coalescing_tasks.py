@@ -0,0 +1,69 @@
+"""Background tasks backend coalescing relation index updates.
+
+Instead of one task per save, the parent is marked as dirty and a single
+named task per index and time window is scheduled at the end of the window.
+The task reindexes the distinct set of dirty parents in batches, so bursts of
+edits on the same or different parents result in a few batched writes.
+"""
+import time
+
+from django.conf import settings
+from django.db import models
+from google.appengine.api import taskqueue
+from google.appengine.ext import deferred
+from search.models import PendingIndexUpdate
+
+default_search_queue = getattr(settings, 'DEFAULT_SEARCH_QUEUE', 'default')
+coalesce_seconds = getattr(settings, 'SEARCH_INDEX_COALESCE_SECONDS', 30)
+coalesce_batch_size = getattr(settings, 'SEARCH_INDEX_COALESCE_BATCH_SIZE', 100)
+
+def get_index_label(app_label, object_name, manager_name):
+    return '%s.%s.%s' % (app_label, object_name, manager_name)
+
+def update_relation_index(search_manager, parent_pk, delete):
+    # Deletions don't need to be told apart, a missing parent removes its
+    # relation index when the batch is processed.
+    app_label = search_manager.model._meta.app_label
+    object_name = search_manager.model._meta.object_name
+    index = get_index_label(app_label, object_name, search_manager.name)
+    PendingIndexUpdate(id='%s:%s' % (index, parent_pk), index=index,
+                       parent_pk=parent_pk).save()
+
+    # One task per index and window, later saves in the same window are
+    # picked up by the already scheduled task.
+    window = int(time.time() / coalesce_seconds)
+    name = 'search-%s-%d' % (index.replace('.', '-'), window)
+    try:
+        deferred.defer(update, app_label, object_name, search_manager.name,
+            _queue=default_search_queue, _name=name,
+            _countdown=(window + 1) * coalesce_seconds - time.time())
+    except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+        pass
+
+def update(app_label, object_name, manager_name, followups=1):
+    model = models.get_model(app_label, object_name)
+    manager = getattr(model, manager_name)
+    index = get_index_label(app_label, object_name, manager_name)
+    pending = list(PendingIndexUpdate.objects.filter(
+        index=index)[:coalesce_batch_size])
+
+    if pending:
+        manager.update_relation_indexes(list(set(
+            marker.parent_pk for marker in pending)))
+
+        # Only drop the markers which weren't set again while reindexing
+        marked_on = dict((marker.pk, marker.marked_on) for marker in
+            PendingIndexUpdate.objects.filter(pk__in=[m.pk for m in pending]))
+        PendingIndexUpdate.objects.filter(pk__in=[marker.pk for marker in pending
+            if marked_on.get(marker.pk) == marker.marked_on]).delete()
+
+    if len(pending) == coalesce_batch_size:
+        deferred.defer(update, app_label, object_name, manager_name,
+            followups, _queue=default_search_queue)
+    elif followups:
+        # The query above is eventually consistent, markers saved just
+        # before this run may not have been visible yet and the task of
+        # their window has already been claimed, so look again later.
+        deferred.defer(update, app_label, object_name, manager_name,
+            followups - 1, _queue=default_search_queue,
+            _countdown=coalesce_seconds)
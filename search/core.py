@@ -1,12 +1,33 @@
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.db.models import signals
 from djangotoolbox.fields import ListField
 from djangotoolbox.utils import getattr_by_path
-from copy import deepcopy
+from collections import OrderedDict
+from copy import copy, deepcopy
+import hashlib
+import heapq
+import json
+import math
 import re
 import string
+import threading
+import time
+
+# Seconds the pks matching a search are cached, a false value disables it.
+# Relation index queries are eventually consistent: a search run right after
+# a generation bump can still read the old index and cache it under the new
+# generation, so the timeout also bounds how long such stale results live.
+search_results_cache_timeout = getattr(settings,
+    'SEARCH_RESULTS_CACHE_TIMEOUT', 60)
+
+# Maximum number of relation indexes ranked_search scores per query. Scores
+# depend on the query terms so the datastore can't order by them: matches are
+# read with their term weights and ranked in memory. Beyond this many matches
+# the ones scored are the first ones in key order, not the best ones.
+ranked_search_scan_limit = getattr(settings, 'SEARCH_RANKED_SCAN_LIMIT', 1000)
 
 _PUNCTUATION_REGEX = re.compile(
     '[' + re.escape(string.punctuation.replace('-', '').replace(
@@ -28,8 +49,45 @@ def startswith(words, indexing, **kwargs):
                        for count in range(1, len(word)+1)])
     return result
 
-def porter_stemmer(words, language, **kwargs):
-    """Porter-stemmer in various languages."""
+class StemCache(object):
+    """Bounded least recently used memo of word stems."""
+    def __init__(self, stem, max_size=10000):
+        self.stem = stem
+        self.max_size = max_size
+        self.stems = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __call__(self, word):
+        with self.lock:
+            try:
+                # Move the word to the most recently used end
+                result = self.stems.pop(word)
+                self.stems[word] = result
+                return result
+            except KeyError:
+                pass
+        result = self.stem(word)
+        with self.lock:
+            self.stems[word] = result
+            if len(self.stems) > self.max_size:
+                self.stems.popitem(last=False)
+        return result
+
+# Stem functions by language, and the memos shared by the languages using
+# the same stemmer module.
+_stemmers = {}
+_stem_caches = {}
+
+def get_stemmer(language):
+    """Returns the memoized stem function for a language, falling back to the
+    base language, then to English and then to leaving words unstemmed.
+    Stemmers are resolved once per language and share their memo between
+    languages using the same module."""
+    try:
+        return _stemmers[language]
+    except KeyError:
+        pass
+
     languages = [language,]
     if '-' in language:
         languages.append(language.split('-')[0])
@@ -38,18 +96,24 @@ def porter_stemmer(words, language, **kwargs):
     languages.append('en')
 
     # Find a stemmer for this language
-    for language in languages:
+    stemmer = lambda word: word
+    for name in languages:
+        module_name = 'search.porter_stemmers.%s' % name
         try:
-            stem = __import__('search.porter_stemmers.%s' % language,
-                                 {}, {}, ['']).stem
-        except:
+            module = __import__(module_name, {}, {}, [''])
+        except ImportError:
             continue
+        stemmer = _stem_caches.get(module_name)
+        if stemmer is None:
+            stemmer = _stem_caches.setdefault(module_name, StemCache(module.stem,
+                getattr(settings, 'SEARCH_STEM_CACHE_SIZE', 10000)))
         break
+    return _stemmers.setdefault(language, stemmer)
 
-    result = []
-    for word in words:
-        result.append(stem(word))
-    return result
+def porter_stemmer(words, language, **kwargs):
+    """Porter-stemmer in various languages."""
+    stem = get_stemmer(language)
+    return [stem(word) for word in words]
 
 stop_words = {
     'en': set(('a', 'an', 'and', 'or', 'the', 'these', 'those', 'whose', 'to')),
@@ -179,10 +243,14 @@ class SearchManager(models.Manager):
     so they can be searched, too.
 
     With "filters" you can specify when a values index should be created.
+
+    With "field_weights" the relation index also stores per term weights,
+    based on the term frequency in each field and the weight of the field,
+    used by ranked_search to order results by relevance.
     """
     def __init__(self, fields_to_index, indexer=None, splitter=default_splitter,
             relation_index=True, integrate='*', filters={},
-            language=site_language, **kwargs):
+            language=site_language, field_weights=None, **kwargs):
         # integrate should be specified when using the relation index otherwise
         # we doublicate the amount of data in the datastore and the relation
         # index makes no sense any more
@@ -208,6 +276,9 @@ class SearchManager(models.Manager):
         # search_list_field_name will be set if no relation_index is used that is
         # for relation_index=False or for the relation_index_model itself
         self.search_list_field_name = ''
+        if field_weights and not relation_index:
+            raise ValueError('field_weights requires a relation index!')
+        self.field_weights = field_weights
         super(SearchManager, self).__init__(**kwargs)
 
     def contribute_to_class(self, model, name):
@@ -238,8 +309,9 @@ class SearchManager(models.Manager):
             filtered = filtered.filter(**filter)
         return filtered
 
-    def _search(self, query, indexer=None, splitter=None,
+    def get_search_words(self, query, indexer=None, splitter=None,
             language=settings.LANGUAGE_CODE):
+        """Returns the sorted, normalized words used to query the index."""
         if not splitter:
             splitter = default_splitter
         words = splitter(query, indexing=False, language=language)
@@ -249,11 +321,19 @@ class SearchManager(models.Manager):
         words = set(words)
         if len(words) >= 4:
             words -= get_stop_words(language)
+        return sorted(words)
+
+    def _search_words(self, words, query):
         # Don't allow empty queries
         if not words and query:
             # This query will never find anything
             return self.filter(()).filter({self.search_list_field_name:' '})
-        return self.filter(sorted(words))
+        return self.filter(words)
+
+    def _search(self, query, indexer=None, splitter=None,
+            language=settings.LANGUAGE_CODE):
+        return self._search_words(self.get_search_words(query, indexer,
+            splitter, language), query)
 
     def should_index(self, values):
         # Check if filter doesn't match
@@ -298,6 +378,7 @@ class SearchManager(models.Manager):
         if delete or not self.should_index(values):
             if index:
                 index.delete()
+                bump_index_generation(self.model)
             return
 
         # Update/create index
@@ -309,6 +390,38 @@ class SearchManager(models.Manager):
             setattr(index, key, value)
 
         index.save()
+        bump_index_generation(self.model)
+
+    def update_relation_indexes(self, parent_pks, parents=None):
+        """Batch version of update_relation_index: the parents are fetched with
+        a single batch get, unless already given, stale indexes are deleted
+        in one batch and the others written with one batch put."""
+        relation_index_model = self._relation_index_model
+        if parents is None:
+            parents = self.model.objects.filter(pk__in=list(parent_pks))
+        parents = dict((parent.pk, parent) for parent in parents)
+
+        indexes = []
+        stale_pks = []
+        for parent_pk in parent_pks:
+            values = None
+            if parent_pk in parents:
+                values = self.get_index_values(parents[parent_pk])
+            if not self.should_index(values):
+                stale_pks.append(parent_pk)
+                continue
+            index = relation_index_model(pk=parent_pk, **values)
+            # This guarantees that we also set virtual @properties
+            for key, value in values.items():
+                setattr(index, key, value)
+            indexes.append(index)
+
+        if stale_pks:
+            relation_index_model.objects.filter(pk__in=stale_pks).delete()
+        if indexes:
+            # Entities are written by key so existing indexes are replaced
+            relation_index_model.objects.bulk_create(indexes)
+        bump_index_generation(self.model)
 
     def create_index_model(self):
         attrs = dict(__module__=self.__module__)
@@ -329,6 +442,10 @@ class SearchManager(models.Manager):
                     self.name, field_name,
                 )
 
+        if self.field_weights:
+            attrs['search_term_weights'] = models.TextField(editable=False,
+                                                            null=True)
+
         owner = self
         def __init__(self, *args, **kwargs):
             # Save some space: don't copy the whole indexed text into the
@@ -353,7 +470,9 @@ class SearchManager(models.Manager):
             self.fields_to_index, splitter=self.splitter, indexer=self.indexer,
             language=self.language, relation_index=False))
 
-    def get_index_values(self, parent):
+    def get_index_field_names(self):
+        """Returns the names of the parent fields the relation index is built
+        from: the indexed, integrated and filtered fields."""
         filters = []
         for filter in self.filters.keys():
             if '__' in filter:
@@ -361,8 +480,37 @@ class SearchManager(models.Manager):
             else:
                 filters.append(filter)
         filters = tuple(filters)
+        return set(self.fields_to_index + self.integrate + filters)
+
+    def get_index_state(self, parent):
+        """Returns a snapshot of the values the relation index of the parent is
+        built from, a save leaving it unchanged doesn't need a reindex.
+        Values are read from the instance dict so lazily decoded values stay
+        undecoded, and collections are copied so in place changes show up."""
+        try:
+            attnames = self._index_attnames
+        except AttributeError:
+            attnames = self._index_attnames = tuple(
+                self.model._meta.get_field_by_name(field_name)[0].attname
+                for field_name in sorted(self.get_index_field_names()))
+        values = parent.__dict__
+        state = []
+        for attname in attnames:
+            value = values.get(attname)
+            if isinstance(value, (list, tuple, set, dict)):
+                items = value.values() if isinstance(value, dict) else value
+                if any(isinstance(item, models.Model) for item in items):
+                    # Embedded instances compare by pk, so changes to them
+                    # can't be told apart: never equal to another snapshot.
+                    value = object()
+                else:
+                    value = copy(value)
+            state.append(value)
+        return tuple(state)
+
+    def get_index_values(self, parent):
         values = {}
-        for field_name in set(self.fields_to_index + self.integrate + filters):
+        for field_name in self.get_index_field_names():
             field = self.model._meta.get_field_by_name(field_name)[0]
             if isinstance(field, models.ForeignKey):
                 value = field.pre_save(parent, False)
@@ -375,16 +523,114 @@ class SearchManager(models.Manager):
                 values[field.column] = value
             else:
                 values[field_name] = value
+        if self.field_weights:
+            values['search_term_weights'] = self.get_term_weights(parent)
         return values
 
+    def get_term_weights(self, parent):
+        """Returns the JSON encoded weight of each term of the parent: the sum
+        over the indexed fields of the field weight times the sublinear term
+        frequency in that field."""
+        language = self.language
+        if callable(language):
+            language = language(parent)
+
+        frequencies = {}
+        for field_name in self.fields_to_index:
+            values = getattr_by_path(parent, field_name, None)
+            if not values:
+                values = ()
+            elif not isinstance(values, (list, tuple)):
+                values = (values,)
+            for value in values:
+                # Split in search mode to keep repeated words
+                words = self.splitter(value, indexing=False, language=language)
+                if self.indexer:
+                    words = self.indexer(words, indexing=False,
+                                         language=language)
+                for word in words:
+                    counts = frequencies.setdefault(word, {})
+                    counts[field_name] = counts.get(field_name, 0) + 1
+
+        weights = {}
+        for word, counts in frequencies.items():
+            weights[word] = round(sum(self.field_weights.get(field_name, 1) *
+                (1 + math.log(count)) for field_name, count in counts.items()), 3)
+        return json.dumps(weights)
+
+    def ranked_search(self, query, limit=10, language=settings.LANGUAGE_CODE):
+        """Returns the parents matching all the query terms with the highest
+        score, the sum of the weights of the query terms. Matching indexes are
+        streamed through a heap bounded to limit items so only the top parents
+        are fetched. At most ranked_search_scan_limit matches are scored, see
+        SEARCH_RANKED_SCAN_LIMIT."""
+        if not self.field_weights:
+            raise ValueError('ranked_search requires field_weights!')
+        index_manager = getattr(self._relation_index_model, self.name)
+        words = index_manager.get_search_words(query,
+            indexer=index_manager.indexer, splitter=index_manager.splitter,
+            language=language)
+        items = index_manager._search_words(words, query).values_list(
+            'pk', 'search_term_weights')[:ranked_search_scan_limit].iterator()
+
+        def scored():
+            for pk, weights in items:
+                weights = json.loads(weights) if weights else {}
+                yield sum(weights.get(word, 0) for word in words), pk
+
+        pks = [pk for score, pk in heapq.nlargest(limit, scored())]
+        parents = dict((parent.pk, parent)
+                       for parent in self.model.objects.filter(pk__in=pks))
+        return [parents[pk] for pk in pks if pk in parents]
+
     def search(self, query, language=settings.LANGUAGE_CODE):
         if self.relation_index:
-            items = getattr(self._relation_index_model, self.name).search(query,
-                language=language).values('pk')
-            return RelationIndexQuery(self.model, items)
+            index_manager = getattr(self._relation_index_model, self.name)
+            words = index_manager.get_search_words(query,
+                indexer=index_manager.indexer, splitter=index_manager.splitter,
+                language=language)
+            items = index_manager._search_words(words, query).values('pk')
+            cache_key = 'search_results:%s.%s.%s:%s' % (
+                self.model._meta.app_label, self.model._meta.object_name,
+                self.name, hashlib.md5(repr((language, words))).hexdigest())
+            return RelationIndexQuery(self.model, items, cache_key)
         return self._search(query, splitter=self.splitter,
             indexer=self.indexer, language=language)
 
+def _index_generation_key(model):
+    return 'search_index_generation:%s.%s' % (model._meta.app_label,
+                                              model._meta.object_name)
+
+def get_index_generation(model):
+    """Returns the generation of the search indexes of a model, cached search
+    results are only valid for the generation they were stored with."""
+    key = _index_generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        # Start from the current time so an evicted counter never goes back
+        # to a generation that is still cached.
+        cache.add(key, int(time.time() * 1000))
+        generation = cache.get(key)
+    return generation
+
+def bump_index_generation(model):
+    """Invalidates the cached search results of a model."""
+    key = _index_generation_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000))
+
+def reset_index_generations(sender, **kwargs):
+    """flush doesn't send delete signals, invalidate the cached search results
+    of every indexed model of the app."""
+    for model in models.get_models(sender):
+        for counter, manager_name, manager in model._meta.concrete_managers:
+            if isinstance(manager, SearchManager) and manager.relation_index:
+                bump_index_generation(model)
+                break
+signals.post_syncdb.connect(reset_index_generations)
+
 def load_backend():
     backend = getattr(settings, 'SEARCH_BACKEND', 'search.backends.immediate_update')
     import_list = []
@@ -393,12 +639,34 @@ def load_backend():
     return __import__(backend, globals(), locals(), import_list)
 
 def post(delete, sender, instance, **kwargs):
+    states = instance.__dict__.setdefault('_search_index_states', {})
     for counter, manager_name, manager in sender._meta.concrete_managers:
         if isinstance(manager, SearchManager):
             if manager.relation_index:
+                if not delete:
+                    # Skip saves which didn't change the indexed, integrated
+                    # or filtered values since the parent was loaded or saved.
+                    state = manager.get_index_state(instance)
+                    unchanged = not kwargs.get('created') and \
+                        not kwargs.get('raw') and \
+                        states.get(manager_name) == state
+                    states[manager_name] = state
+                    if unchanged:
+                        continue
                 backend = load_backend()
                 backend.update_relation_index(manager, instance.pk, delete)
 
+def post_init(sender, instance, **kwargs):
+    # Instances created with a pk are taken as loaded from the database,
+    # remember what their relation indexes were built from.
+    if instance.pk is None:
+        return
+    states = {}
+    for counter, manager_name, manager in sender._meta.concrete_managers:
+        if isinstance(manager, SearchManager) and manager.relation_index:
+            states[manager_name] = manager.get_index_state(instance)
+    instance._search_index_states = states
+
 def post_save(sender, instance, **kwargs):
     post(False, sender, instance, **kwargs)
 
@@ -413,6 +681,7 @@ def install_index_model(sender, **kwargs):
             manager.create_index_model()
             needs_relation_index = True
     if needs_relation_index:
+        signals.post_init.connect(post_init, sender=sender)
         signals.post_save.connect(post_save, sender=sender)
         signals.post_delete.connect(post_delete, sender=sender)
 #signals.class_prepared.connect(install_index_model)
@@ -432,40 +701,64 @@ class QueryTraits(object):
 
 class RelationIndexQuery(QueryTraits):
     """Combines the results of multiple queries by appending the queries in the
-    given order."""
-    def __init__(self, model, query):
+    given order.
+
+    The relation index query is executed only once, the matching pks are
+    cached so count() and any number of slices are served from them."""
+    def __init__(self, model, query, cache_key=None):
         self.model = model
         self.query = query
+        self.cache_key = cache_key
+        self._pks = None
 
     def order_by(self, *args, **kwargs):
         self.query = self.query.order_by(*args, **kwargs)
+        self._pks = None
         return self
 
     def filter(self, *args, **kwargs):
         self.query = self.query.filter(*args, **kwargs)
+        # Only plain searches with an ordering are cached
+        self.cache_key = None
+        self._pks = None
         return self
 
+    def get_results_cache_key(self):
+        if not self.cache_key or not search_results_cache_timeout:
+            return None
+        return '%s:%s:%s' % (self.cache_key, get_index_generation(self.model),
+            hashlib.md5(repr(self.query.query.order_by)).hexdigest())
+
+    def get_pks(self):
+        if self._pks is None:
+            cache_key = self.get_results_cache_key()
+            if cache_key:
+                self._pks = cache.get(cache_key)
+            if self._pks is None:
+                self._pks = [instance.pk if isinstance(instance, models.Model)
+                             else instance['pk'] for instance in self.query]
+                if cache_key:
+                    cache.set(cache_key, self._pks,
+                              search_results_cache_timeout)
+        return self._pks
+
     def __getitem__(self, index):
-        pks_slice = index
         if not isinstance(index, slice):
-            pks_slice = slice(None, index + 1, None)
+            return self[index:index + 1 or None][0]
 
-        pks = [instance.pk if isinstance(instance, models.Model) else instance['pk']
-                for instance in self.query[pks_slice]]
-        if not isinstance(index, slice):
-            return self.model.objects.filter(pk__in=pks)[index]
-        return self.model.objects.filter(pk__in=pks)[pks_slice]
-#        return [item for item in self.model.objects.filter(
-#            pk__in=pks) if item]
-        
+        pks = self.get_pks()[index]
+        # Fetch by key and restore the order of the relation index query.
+        items = dict((item.pk, item)
+                     for item in self.model.objects.filter(pk__in=pks))
+        return [items[pk] for pk in pks if pk in items]
 
     def count(self):
-        return self.query.count()
-
-    # TODO: add keys_only query
-#    def values(self, fields):
-#        pass
+        return len(self.get_pks())
 
 def search(model, query, language=settings.LANGUAGE_CODE,
         search_index='search_index'):
-    return getattr(model, search_index).search(query, language)
\ No newline at end of file
+    return getattr(model, search_index).search(query, language)
+
+def ranked_search(model, query, limit=10, language=settings.LANGUAGE_CODE,
+        search_index='search_index'):
+    return getattr(model, search_index).ranked_search(query, limit, language)
\ No newline at end of file
@@ -0,0 +1,70 @@
+from optparse import make_option
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--index', action='store', dest='search_index',
+            default='search_index',
+            help='Name of the search index manager to rebuild.'),
+        make_option('--batch-size', action='store', dest='batch_size',
+            type='int', default=100,
+            help='Number of parents read and indexes written per batch.'),
+        make_option('--cursor', action='store', dest='cursor', default=None,
+            help='Datastore cursor to start from.'),
+        make_option('--resume', action='store_true', dest='resume',
+            default=False,
+            help='Start from the checkpoint saved by an interrupted run.'),
+    )
+    help = "Rebuilds the search relation index of a model in batches, " \
+           "walking the parents in key order."
+    args = "app_label.ModelName"
+
+    def handle(self, *args, **options):
+        from djangoappengine.db.utils import get_cursor, set_cursor
+        from search.core import SearchManager
+
+        if len(args) != 1 or '.' not in args[0]:
+            raise CommandError('Enter the model to reindex as app_label.ModelName.')
+        model = models.get_model(*args[0].split('.', 1))
+        if model is None:
+            raise CommandError('Unknown model: %s' % args[0])
+        manager = getattr(model, options['search_index'], None)
+        if not isinstance(manager, SearchManager) or not manager.relation_index:
+            raise CommandError('%s has no relation search index called %s.' %
+                               (args[0], options['search_index']))
+
+        verbosity = int(options.get('verbosity', 1))
+        batch_size = options['batch_size']
+        checkpoint_key = 'rebuild_search_index:%s:%s' % (args[0],
+                                                         options['search_index'])
+        cursor = options['cursor']
+        if options['resume']:
+            cursor = cache.get(checkpoint_key)
+
+        total = 0
+        while True:
+            parents = model.objects.order_by('pk')
+            if cursor:
+                parents = set_cursor(parents, start=cursor)
+            parents = parents[:batch_size]
+            batch = list(parents)
+            if batch:
+                manager.update_relation_indexes([parent.pk for parent in batch],
+                                                batch)
+                total += len(batch)
+            if len(batch) < batch_size:
+                break
+            cursor = get_cursor(parents)
+            # Checkpoint after every batch so an interrupted run can resume
+            cache.set(checkpoint_key, cursor, 60 * 60 * 24)
+            if verbosity >= 2:
+                self.stdout.write("Indexed %d entities, cursor: %s\n" %
+                                  (total, cursor))
+
+        cache.delete(checkpoint_key)
+        if verbosity >= 1:
+            self.stdout.write("Rebuilt %d search index entities.\n" % total)
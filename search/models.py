@@ -0,0 +1,12 @@
+from django.db import models
+from django.utils import timezone
+from djangotoolbox.fields import RawField
+
+class PendingIndexUpdate(models.Model):
+    """Marks a parent whose relation index has to be updated, used by the
+    coalescing background tasks backend. Keyed by index and parent pk so
+    repeated saves of the same parent only keep one marker."""
+    id = models.CharField(max_length=500, primary_key=True)
+    index = models.CharField(max_length=500)
+    parent_pk = RawField()
+    marked_on = models.DateTimeField(default=timezone.now)
@@ -102,3 +102,170 @@ class TestIndexed(TestCase):
         value.delete()
         self.assertEqual(len(Indexed.value_index.search('value3')), 0)
 
+
+    def test_slicing(self):
+        results = Indexed.one_index.search('one').order_by('one')
+        self.assertEqual(results.count(), 6)
+        ones = [item.one for item in results[:6]]
+        self.assertEqual(ones, sorted(ones))
+        self.assertEqual([item.one for item in results[2:4]], ones[2:4])
+        self.assertEqual(results[3].one, ones[3])
+
+    def test_results_cache(self):
+        from django.core.cache import cache
+        results = Indexed.one_index.search('one').order_by('one')
+        self.assertEqual(results.count(), 6)
+        cache_key = results.get_results_cache_key()
+        self.assertEqual(cache.get(cache_key), results.get_pks())
+        Indexed(one=u'one3').save()
+        results = Indexed.one_index.search('one').order_by('one')
+        self.assertNotEqual(results.get_results_cache_key(), cache_key)
+        self.assertEqual(results.count(), 7)
+
+    def test_stemmer_resolution(self):
+        from search.core import get_stemmer, porter_stemmer
+        from search.porter_stemmers import en
+        self.assertTrue(get_stemmer('en-us') is get_stemmer('xx'))
+        self.assertEqual(porter_stemmer([u'indexing', u'indexes'], language='en-us'),
+                         [en.stem(u'indexing'), en.stem(u'indexes')])
+
+    def test_rebuild_search_index(self):
+        from django.core import management
+        index_model = Indexed.one_two_index._relation_index_model
+        index_model.objects.all().delete()
+        self.assertEqual(len(Indexed.one_two_index.search('foo bar')), 0)
+        management.call_command('rebuild_search_index', 'search.Indexed',
+                                search_index='one_two_index', batch_size=4,
+                                verbosity=0)
+        self.assertEqual(index_model.objects.count(), Indexed.objects.count())
+        self.assertEqual(len(Indexed.one_two_index.search('foo bar')), 1)
+        self.assertEqual(len(Indexed.one_two_index.search('two1')), 1)
+
+    def test_skip_unchanged(self):
+        updated = []
+        for manager in (Indexed.one_two_index, Indexed.value_index):
+            manager.update_relation_index = lambda parent_pk, delete, \
+                name=manager.name: updated.append(name)
+        try:
+            value = Indexed.value_index.search('value0').get()
+            value.save()
+            self.assertEqual(updated, [])
+            value.two = 'two changed'
+            value.save()
+            self.assertEqual(updated, ['one_two_index'])
+            value.check = not value.check
+            value.save()
+            # one_two_index integrates every field
+            self.assertEqual(updated, ['one_two_index', 'one_two_index',
+                                       'value_index'])
+        finally:
+            del Indexed.one_two_index.update_relation_index
+            del Indexed.value_index.update_relation_index
+
+class RankedIndexed(models.Model):
+    title = models.CharField(max_length=500)
+    text = models.CharField(max_length=500)
+
+register(RankedIndexed, ('title', 'text'), search_index='ranked_index',
+         field_weights={'title': 3, 'text': 1})
+
+class TestRankedSearch(TestCase):
+    def setUp(self):
+        RankedIndexed(title=u'other', text=u'datastore').save()
+        RankedIndexed(title=u'datastore', text=u'other').save()
+        RankedIndexed(title=u'other', text=u'datastore datastore').save()
+        RankedIndexed(title=u'other', text=u'other').save()
+
+    def test_ranked_search(self):
+        results = RankedIndexed.ranked_index.ranked_search('datastore')
+        self.assertEqual([(item.title, item.text) for item in results],
+                         [(u'datastore', u'other'),
+                          (u'other', u'datastore datastore'),
+                          (u'other', u'datastore')])
+        results = RankedIndexed.ranked_index.ranked_search('datastore', limit=1)
+        self.assertEqual([item.title for item in results], [u'datastore'])
+
+    def test_ranked_search_scan_limit(self):
+        import search.core
+        scan_limit = search.core.ranked_search_scan_limit
+        search.core.ranked_search_scan_limit = 2
+        try:
+            results = RankedIndexed.ranked_index.ranked_search('datastore')
+        finally:
+            search.core.ranked_search_scan_limit = scan_limit
+        self.assertEqual(len(results), 2)
+
+class FakeClock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+class TestCoalescingTasks(TestCase):
+    """Runs the tasks of the coalescing backend queued in the taskqueue
+    stub by hand."""
+    def setUp(self):
+        from google.appengine.api import apiproxy_stub_map
+        from search.backends import gae_coalescing_tasks
+        self.backend = gae_coalescing_tasks
+        self.stub = apiproxy_stub_map.apiproxy.GetStub('taskqueue')
+        self.stub.FlushQueue(self.backend.default_search_queue)
+        # the middle of a window, so all saves of a test fall into it.
+        self.backend.time = FakeClock(
+            self.backend.coalesce_seconds * 1000 + 1)
+        self.updated = []
+        Indexed.one_index.update_relation_indexes = lambda parent_pks, \
+            parents=None: self.updated.append(sorted(parent_pks))
+
+    def tearDown(self):
+        import time
+        self.backend.time = time
+        del Indexed.one_index.update_relation_indexes
+        self.stub.FlushQueue(self.backend.default_search_queue)
+
+    def save(self, parent_pk):
+        self.backend.update_relation_index(Indexed.one_index, parent_pk, False)
+
+    def get_tasks(self):
+        return self.stub.GetTasks(self.backend.default_search_queue)
+
+    def run_task(self, task):
+        import base64
+        from google.appengine.ext import deferred
+        deferred.run(base64.b64decode(task['body']))
+        self.stub.DeleteTask(self.backend.default_search_queue, task['name'])
+
+    def test_saves_in_window_coalesced(self):
+        for parent_pk in (1, 2, 1):
+            self.save(parent_pk)
+        tasks = self.get_tasks()
+        self.assertEqual(len(tasks), 1)
+        self.run_task(tasks[0])
+        self.assertEqual(self.updated, [[1, 2]])
+        self.assertEqual(self.backend.PendingIndexUpdate.objects.count(), 0)
+
+    def test_marker_after_run_picked_by_followup(self):
+        self.save(1)
+        window_task, = self.get_tasks()
+        self.run_task(window_task)
+        self.assertEqual(self.updated, [[1]])
+        # the task of the window was claimed, this save can't queue it again.
+        self.save(2)
+        followup, = self.get_tasks()
+        self.assertNotEqual(followup['name'], window_task['name'])
+        self.run_task(followup)
+        self.assertEqual(self.updated, [[1], [2]])
+        # followups don't queue followups of their own.
+        self.assertEqual(self.get_tasks(), [])
+
+    def test_claimed_task_name_ignored(self):
+        self.save(1)
+        self.save(1)
+        window_task, = self.get_tasks()
+        self.stub.DeleteTask(self.backend.default_search_queue,
+                             window_task['name'])
+        # re-adding the deleted (tombstoned) name is rejected and ignored.
+        self.save(2)
+        self.assertEqual(self.get_tasks(), [])
+        self.assertEqual(self.backend.PendingIndexUpdate.objects.count(), 2)
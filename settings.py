@@ -79,5 +79,10 @@ REST_FRAMEWORK = {
     #'DEFAULT_PERMISSION_CLASSES': [
     #    'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     #]
-    'POST_PAGINATE_BY': 2
-}
\ No newline at end of file
+    'POST_PAGINATE_BY': 2,
+    'COMMENT_PAGINATE_BY': 10,
+}
+
+# Where comments are stored, 'embedded' in the posts or 'kind' for their own
+# kind. See blog/comments.py before switching a live site.
+BLOG_COMMENT_STORAGE = 'embedded'
\ No newline at end of file
@@ -12,6 +12,7 @@ app.Post = Backbone.Model.extend({
         text: '',
         tags: [],
         comments: [],
+        comment_count: 0,
         user_name: '',
         user_id: null,
         created_on_readable: null,